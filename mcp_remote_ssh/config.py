@@ -193,6 +193,7 @@ class SecurityConfig:
     command_timeout_seconds: int = 300  # 5 minutes for long operations
     rate_limit_per_minute: int = 500  # High rate for admin tasks
     max_sessions: int = 20  # Many concurrent sessions
+    session_timeout_hours: int = 8  # Sessions older than this are cleaned up
     
     def __post_init__(self):
         """Post-initialization to ensure permissibility level is properly set."""
@@ -229,6 +230,9 @@ class SSHConfig:
     proxy_command: Optional[str] = None
     connect_timeout: int = 30
     keepalive_interval: int = 30
+    compression: bool = False
+    # Seconds without output before a shell command is treated as hung
+    hang_threshold_seconds: int = 10
     # Password configuration
     default_password: Optional[str] = None
     sudo_password: Optional[str] = None
@@ -252,6 +256,8 @@ class SSHConfig:
             proxy_command=os.getenv('MCP_SSH_PROXY_COMMAND'),
             connect_timeout=int(os.getenv('MCP_SSH_CONNECT_TIMEOUT', '30')),
             keepalive_interval=int(os.getenv('MCP_SSH_KEEPALIVE', '30')),
+            compression=os.getenv('MCP_SSH_COMPRESSION', 'false').lower() == 'true',
+            hang_threshold_seconds=int(os.getenv('MCP_SSH_HANG_THRESHOLD', '10')),
             # Password configuration from environment with MCP_PASSWORD fallback
             default_password=default_password,
             sudo_password=sudo_password,
@@ -1,13 +1,17 @@
 """Interactive password service for MCP SSH operations."""
 
 import asyncio
+import inspect
 import logging
-from typing import Dict, Any, Optional, Callable, Awaitable
+from typing import Dict, Any, Optional, Callable, Awaitable, Union
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# A password callback may be a coroutine function or a plain function
+PasswordCallback = Callable[['PasswordRequest'], Union[Awaitable[Optional[str]], Optional[str]]]
+
 @dataclass
 class PasswordRequest:
     """Represents a password request."""
@@ -36,11 +40,15 @@ class InteractivePasswordService:
     def __init__(self):
         self.pending_requests: Dict[str, PasswordRequest] = {}
         self.response_callbacks: Dict[str, asyncio.Future] = {}
-        self.password_callback: Optional[Callable[[PasswordRequest], Awaitable[Optional[str]]]] = None
+        self.password_callback: Optional[PasswordCallback] = None
         self._cleanup_task: Optional[asyncio.Task] = None
     
-    def set_password_callback(self, callback: Callable[[PasswordRequest], Awaitable[Optional[str]]]) -> None:
-        """Set the callback function for requesting passwords from the user."""
+    def set_password_callback(self, callback: Optional[PasswordCallback]) -> None:
+        """Set the callback function for requesting passwords from the user.
+        
+        Only awaitable results are awaited, so a plain function that does no
+        I/O costs no coroutine.
+        """
         self.password_callback = callback
         logger.info("Password callback set for interactive password service")
     
@@ -80,7 +88,9 @@ class InteractivePasswordService:
         try:
             # Use the callback to request password from user
             if self.password_callback:
-                password = await self.password_callback(request)
+                password = self.password_callback(request)
+                if inspect.isawaitable(password):
+                    password = await password
                 if password:
                     future.set_result(password)
                 else:
@@ -9,6 +9,37 @@ from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
 
+# Prompt patterns in priority order, compiled once rather than on every output chunk
+_SUDO_PROMPT_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'\[sudo\] password for [^:]+:',
+    r'\[sudo\] password for [^:]*$',
+    r'Password:',
+    r'password:',
+    r'sudo: a terminal is required to read the password',
+    r'sudo: no tty present and no askpass program specified',
+    r'We trust you have received the usual lecture from the local System',
+))
+
+_INTERACTIVE_PROMPT_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'Password:',
+    r'password:',
+    r'Enter password:',
+    r'\[sudo\] password for [^:]+:',
+    r'\[sudo\] password for [^:]*$',
+    r'sudo: a terminal is required to read the password',
+    r'sudo: no tty present and no askpass program specified',
+    r'SSH password:',
+    r'SSH key passphrase:',
+    r'We trust you have received the usual lecture from the local System',
+))
+
+def _any_of(patterns) -> 're.Pattern':
+    """Combine prompt patterns into one alternation, so output without a prompt costs a single scan."""
+    return re.compile('|'.join(f'(?:{pattern.pattern})' for pattern in patterns), re.IGNORECASE)
+
+_SUDO_PROMPT_ANY = _any_of(_SUDO_PROMPT_PATTERNS)
+_INTERACTIVE_PROMPT_ANY = _any_of(_INTERACTIVE_PROMPT_PATTERNS)
+
 @dataclass
 class PasswordPrompt:
     """Represents a password prompt detected in SSH output."""
@@ -28,6 +59,9 @@ class PasswordResponse:
 class PasswordHandler(ABC):
     """Abstract base class for password handlers following Interface Segregation Principle."""
     
+    # Matches wherever detect_prompt could find a prompt; None if unknown
+    prompt_patterns: Optional[tuple] = None
+    
     @abstractmethod
     async def detect_prompt(self, output: str) -> Optional[PasswordPrompt]:
         """Detect if output contains a password prompt."""
@@ -46,17 +80,11 @@ class PasswordHandler(ABC):
 class SudoPasswordHandler(PasswordHandler):
     """Handles sudo password prompts specifically."""
     
+    prompt_patterns = _SUDO_PROMPT_PATTERNS
+    
     def __init__(self, sudo_password: Optional[str] = None):
         self.sudo_password = sudo_password
-        self.sudo_patterns = [
-            r'\[sudo\] password for [^:]+:',
-            r'\[sudo\] password for [^:]*$',
-            r'Password:',
-            r'password:',
-            r'sudo: a terminal is required to read the password',
-            r'sudo: no tty present and no askpass program specified',
-            r'We trust you have received the usual lecture from the local System',
-        ]
+        self.sudo_patterns = _SUDO_PROMPT_PATTERNS
     
     def can_handle(self, prompt_type: str) -> bool:
         """Check if this handler can handle sudo prompts."""
@@ -64,10 +92,12 @@ class SudoPasswordHandler(PasswordHandler):
     
     async def detect_prompt(self, output: str) -> Optional[PasswordPrompt]:
         """Detect sudo password prompts in output."""
+        if not _SUDO_PROMPT_ANY.search(output):
+            return None
         for pattern in self.sudo_patterns:
-            match = re.search(pattern, output, re.IGNORECASE)
+            match = pattern.search(output)
             if match:
-                logger.debug(f"Detected sudo prompt with pattern: {pattern}")
+                logger.debug(f"Detected sudo prompt with pattern: {pattern.pattern}")
                 return PasswordPrompt(
                     prompt_type='sudo',
                     prompt_text=match.group(0),
@@ -91,6 +121,8 @@ class SudoPasswordHandler(PasswordHandler):
 class InteractivePasswordHandler(PasswordHandler):
     """Handles interactive password prompts by requesting user input."""
     
+    prompt_patterns = _INTERACTIVE_PROMPT_PATTERNS
+    
     def __init__(self, password_callback=None):
         self.password_callback = password_callback
     
@@ -100,24 +132,12 @@ class InteractivePasswordHandler(PasswordHandler):
     
     async def detect_prompt(self, output: str) -> Optional[PasswordPrompt]:
         """Detect interactive password prompts."""
-        # Common password prompt patterns
-        patterns = [
-            r'Password:',
-            r'password:',
-            r'Enter password:',
-            r'\[sudo\] password for [^:]+:',
-            r'\[sudo\] password for [^:]*$',
-            r'sudo: a terminal is required to read the password',
-            r'sudo: no tty present and no askpass program specified',
-            r'SSH password:',
-            r'SSH key passphrase:',
-            r'We trust you have received the usual lecture from the local System',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, output, re.IGNORECASE)
+        if not _INTERACTIVE_PROMPT_ANY.search(output):
+            return None
+        for pattern in _INTERACTIVE_PROMPT_PATTERNS:
+            match = pattern.search(output)
             if match:
-                logger.debug(f"Detected interactive prompt with pattern: {pattern}")
+                logger.debug(f"Detected interactive prompt with pattern: {pattern.pattern}")
                 return PasswordPrompt(
                     prompt_type='interactive',
                     prompt_text=match.group(0),
@@ -145,20 +165,41 @@ class PasswordManager:
     
     def __init__(self):
         self.handlers: List[PasswordHandler] = []
+        self._prompt_any: Optional['re.Pattern'] = None
     
     def add_handler(self, handler: PasswordHandler) -> None:
         """Add a password handler."""
         self.handlers.append(handler)
+        self._rebuild_prompt_any()
         logger.debug(f"Added password handler: {handler.__class__.__name__}")
     
     def remove_handler(self, handler: PasswordHandler) -> None:
         """Remove a password handler."""
         if handler in self.handlers:
             self.handlers.remove(handler)
+            self._rebuild_prompt_any()
             logger.debug(f"Removed password handler: {handler.__class__.__name__}")
     
+    def _rebuild_prompt_any(self) -> None:
+        """Combine every handler's prompt patterns, so output without a prompt is scanned once.
+        
+        Left unset if any handler does not declare its patterns, since only it
+        can tell whether the output holds its prompt.
+        """
+        patterns = {}
+        for handler in self.handlers:
+            if handler.prompt_patterns is None:
+                self._prompt_any = None
+                return
+            for pattern in handler.prompt_patterns:
+                patterns.setdefault(pattern.pattern, pattern)
+        self._prompt_any = _any_of(patterns.values()) if patterns else None
+    
     async def detect_and_handle_prompt(self, output: str, context: Dict[str, Any]) -> Optional[PasswordResponse]:
         """Detect and handle any password prompt in the output."""
+        if self._prompt_any is not None and not self._prompt_any.search(output):
+            return None
+        # Handlers are asked in order, so the first to recognise a prompt handles it
         for handler in self.handlers:
             prompt = await handler.detect_prompt(output)
             if prompt:
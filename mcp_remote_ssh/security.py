@@ -10,6 +10,21 @@ from .security_patterns import SecurityPatternManager
 
 logger = logging.getLogger(__name__)
 
+# Dangerous path patterns for file transfers, compiled once for all sessions
+_DANGEROUS_PATH_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'\.\./',  # Directory traversal
+    r'/etc/',  # System config
+    r'/proc/',  # Process info
+    r'/sys/',  # System info
+    r'/dev/',  # Device files
+    r'/boot/',  # Boot files
+    r'~/.ssh/',  # SSH keys
+    r'/root/',  # Root directory
+))
+
+# Validation results kept per SecurityManager; agents re-run the same commands often
+_VALIDATION_CACHE_SIZE = 256
+
 @dataclass
 class CommandValidationResult:
     """Result of command validation."""
@@ -23,9 +38,25 @@ class SecurityManager:
     def __init__(self):
         self.config = get_config().security
         self.pattern_manager = SecurityPatternManager()
+        self._validation_cache: Dict[Tuple[str, PermissibilityLevel], CommandValidationResult] = {}
     
     def validate_command(self, command: str) -> CommandValidationResult:
         """Validate if a command is allowed to run based on permissibility level."""
+        key = (command, self.config.permissibility_level)
+        result = self._validation_cache.get(key)
+        if result is None:
+            result = self._validate_command_uncached(command)
+            if len(self._validation_cache) >= _VALIDATION_CACHE_SIZE:
+                self._validation_cache.clear()
+            self._validation_cache[key] = result
+        return result
+    
+    def clear_validation_cache(self) -> None:
+        """Forget cached validation results, e.g. after the allowed commands change."""
+        self._validation_cache.clear()
+    
+    def _validate_command_uncached(self, command: str) -> CommandValidationResult:
+        """Run the full permissibility and pattern checks for a command."""
         if not command or not command.strip():
             return CommandValidationResult(False, "Empty command")
         
@@ -113,21 +144,9 @@ class SecurityManager:
         
         path = path.strip()
         
-        # Dangerous path patterns
-        dangerous_patterns = [
-            r'\.\./',  # Directory traversal
-            r'/etc/',  # System config
-            r'/proc/',  # Process info
-            r'/sys/',  # System info
-            r'/dev/',  # Device files
-            r'/boot/',  # Boot files
-            r'~/.ssh/',  # SSH keys
-            r'/root/',  # Root directory
-        ]
-        
-        for pattern in dangerous_patterns:
-            if re.search(pattern, path, re.IGNORECASE):
-                return CommandValidationResult(False, f"Dangerous path pattern: {pattern}")
+        for pattern in _DANGEROUS_PATH_PATTERNS:
+            if pattern.search(path):
+                return CommandValidationResult(False, f"Dangerous path pattern: {pattern.pattern}")
         
         # Only allow certain directories
         allowed_prefixes = [
@@ -35,8 +35,11 @@ class SecurityPattern(ABC):
 class SecretPattern(SecurityPattern):
     """Pattern for detecting and redacting secrets."""
     
-    def __init__(self, name: str, pattern: str, replacement: str):
+    def __init__(self, name: str, pattern: str, replacement: str, hint: Optional[str] = None):
         super().__init__(name, pattern, replacement)
+        # Casefolded literal that every match contains; lets redaction skip the
+        # regex (which can't use a literal prefix search under IGNORECASE)
+        self.hint = hint
     
     def match(self, text: str) -> PatternMatch:
         """Match secret pattern and return replacement."""
@@ -114,13 +117,15 @@ class SecurityPatternManager:
     def _initialize_secret_patterns(self) -> None:
         """Initialize secret detection patterns."""
         self.secret_patterns = [
-            SecretPattern("base64_token", r'[A-Za-z0-9+/]{40,}={0,2}', '[REDACTED_TOKEN]'),
-            SecretPattern("openai_key", r'sk-[A-Za-z0-9]{48}', '[REDACTED_API_KEY]'),
-            SecretPattern("github_token", r'ghp_[A-Za-z0-9]{36}', '[REDACTED_GITHUB_TOKEN]'),
-            SecretPattern("gitlab_token", r'glpat-[A-Za-z0-9_\-]{20}', '[REDACTED_GITLAB_TOKEN]'),
-            SecretPattern("slack_token", r'xox[baprs]-[A-Za-z0-9\-]{10,48}', '[REDACTED_SLACK_TOKEN]'),
-            SecretPattern("aws_key", r'AKIA[0-9A-Z]{16}', '[REDACTED_AWS_KEY]'),
-            SecretPattern("private_key", r'-----BEGIN [A-Z ]+-----.*?-----END [A-Z ]+-----', '[REDACTED_PRIVATE_KEY]'),
+            # The lookbehind only lets a match start at the beginning of a run, so
+            # shorter runs fail once instead of being retried from every offset
+            SecretPattern("base64_token", r'(?<![A-Za-z0-9+/])[A-Za-z0-9+/]{40,}={0,2}', '[REDACTED_TOKEN]'),
+            SecretPattern("openai_key", r'sk-[A-Za-z0-9]{48}', '[REDACTED_API_KEY]', hint='sk-'),
+            SecretPattern("github_token", r'ghp_[A-Za-z0-9]{36}', '[REDACTED_GITHUB_TOKEN]', hint='ghp_'),
+            SecretPattern("gitlab_token", r'glpat-[A-Za-z0-9_\-]{20}', '[REDACTED_GITLAB_TOKEN]', hint='glpat-'),
+            SecretPattern("slack_token", r'xox[baprs]-[A-Za-z0-9\-]{10,48}', '[REDACTED_SLACK_TOKEN]', hint='xox'),
+            SecretPattern("aws_key", r'AKIA[0-9A-Z]{16}', '[REDACTED_AWS_KEY]', hint='akia'),
+            SecretPattern("private_key", r'-----BEGIN [A-Z ]+-----.*?-----END [A-Z ]+-----', '[REDACTED_PRIVATE_KEY]', hint='-----begin '),
         ]
     
     def _initialize_dangerous_patterns(self) -> None:
@@ -184,10 +189,21 @@ class SecurityPatternManager:
             return text
         
         result = text
+        folded = None
         for pattern in self.secret_patterns:
-            match = pattern.match(result)
-            if match.matched and match.replacement:
-                result = pattern.pattern.sub(match.replacement, result)
+            if not pattern.replacement:
+                continue
+            if pattern.hint is not None:
+                if folded is None:
+                    folded = result.casefold()
+                if pattern.hint not in folded:
+                    continue
+            # sub() returns the same object when nothing matched, so a separate
+            # search first would only scan the text twice
+            redacted = pattern.pattern.sub(pattern.replacement, result)
+            if redacted is not result:
+                result = redacted
+                folded = None
         
         return result
     
@@ -3,27 +3,10 @@
 import asyncio
 import logging
 import sys
-from typing import Any, Dict, List, Optional, Union
-import uuid
-import base64
-from datetime import datetime
-
-try:
-    from mcp.server.fastmcp import FastMCP
-    from mcp.server import NotificationOptions
-    from mcp.types import (
-        Resource, Tool, TextContent, ImageContent, EmbeddedResource,
-        CallToolRequest, ListResourcesRequest, ListToolsRequest,
-        ReadResourceRequest, GetPromptRequest, ListPromptsRequest
-    )
-    MCP_AVAILABLE = True
-except ImportError:
-    MCP_AVAILABLE = False
-    print("MCP dependencies not installed. Install with: pip install modelcontextprotocol")
+from typing import Any, Callable, Dict, List, Optional
 
 from .config import get_config
 from .session_manager import get_session_manager
-from .session import CommandResult, SessionInfo
 from .security import get_security_manager
 from .tool_handlers import ToolHandlerFactory
 
@@ -40,100 +23,161 @@ session_manager = get_session_manager()
 security_manager = get_security_manager()
 tool_handler_factory = ToolHandlerFactory()
 
+# Bound once so each tool call does a single global lookup
+_create_handler = tool_handler_factory.create_handler
+
+# Tool implementations. These are plain coroutines; they are only registered
+# with FastMCP (and their schemas built) when main() actually starts a server.
+
+async def ssh_connect(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    username: Optional[str] = None,
+    session_id: Optional[str] = None,
+    auth: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Establish SSH connection to a remote host."""
+    handler = _create_handler('ssh_connect')
+    return await handler.execute(
+        host=host,
+        port=port,
+        username=username,
+        session_id=session_id,
+        auth=auth
+    )
+
+async def ssh_run(
+    session_id: str,
+    cmd: str,
+    input_data: Optional[str] = None,
+    timeout_ms: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    sudo_password: Optional[str] = None,
+    isolated: bool = False
+) -> Dict[str, Any]:
+    """Execute a command in an existing SSH session.
+    
+    Set isolated=True to run outside the persistent shell (no shared cwd/env) for a
+    faster, exact exit status.
+    """
+    handler = _create_handler('ssh_run')
+    return await handler.execute(
+        session_id=session_id,
+        cmd=cmd,
+        input_data=input_data,
+        timeout_ms=timeout_ms,
+        max_bytes=max_bytes,
+        sudo_password=sudo_password,
+        isolated=isolated
+    )
+
+async def ssh_run_batch(
+    session_id: str,
+    cmds: List[str],
+    timeout_ms: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    sudo_password: Optional[str] = None
+) -> Dict[str, Any]:
+    """Execute several commands in order in an existing SSH session, in one round-trip.
+    
+    Returns one result per command; the timeout and output limits apply to the whole batch.
+    """
+    handler = _create_handler('ssh_run_batch')
+    return await handler.execute(
+        session_id=session_id,
+        cmds=cmds,
+        timeout_ms=timeout_ms,
+        max_bytes=max_bytes,
+        sudo_password=sudo_password
+    )
+
+async def ssh_disconnect(session_id: str) -> Dict[str, Any]:
+    """Disconnect SSH session."""
+    handler = _create_handler('ssh_disconnect')
+    return await handler.execute(session_id=session_id)
+
+async def ssh_upload(
+    session_id: str,
+    path: str,
+    bytes_base64: str,
+    mode: Optional[str] = None
+) -> Dict[str, Any]:
+    """Upload base64-encoded content to a file on the remote system."""
+    handler = _create_handler('ssh_upload')
+    return await handler.execute(
+        session_id=session_id,
+        path=path,
+        bytes_base64=bytes_base64,
+        mode=mode
+    )
+
+async def ssh_download(
+    session_id: str,
+    path: str,
+    max_bytes: Optional[int] = None
+) -> Dict[str, Any]:
+    """Download a file from the remote system (returned base64-encoded)."""
+    handler = _create_handler('ssh_download')
+    return await handler.execute(
+        session_id=session_id,
+        path=path,
+        max_bytes=max_bytes
+    )
+
+async def ssh_list_sessions() -> Dict[str, Any]:
+    """List all active SSH sessions."""
+    handler = _create_handler('ssh_list_sessions')
+    return await handler.execute()
+
+async def ssh_list_password_requests() -> Dict[str, Any]:
+    """List all pending password requests."""
+    handler = _create_handler('ssh_list_password_requests')
+    return await handler.execute()
+
+async def ssh_provide_password(request_id: str, password: str) -> Dict[str, Any]:
+    """Provide a password for a pending request."""
+    handler = _create_handler('ssh_provide_password')
+    return await handler.execute(request_id=request_id, password=password)
+
+async def ssh_cancel_password_request(request_id: str) -> Dict[str, Any]:
+    """Cancel a pending password request."""
+    handler = _create_handler('ssh_cancel_password_request')
+    return await handler.execute(request_id=request_id)
+
+async def ssh_get_permissibility_info() -> Dict[str, Any]:
+    """Get information about current permissibility level and restrictions."""
+    handler = _create_handler('ssh_get_permissibility_info')
+    return await handler.execute()
+
+def get_tools() -> List[Callable[..., Any]]:
+    """Get the tool coroutines exposed by the server, undecorated."""
+    return [
+        ssh_connect,
+        ssh_run,
+        ssh_run_batch,
+        ssh_disconnect,
+        ssh_upload,
+        ssh_download,
+        ssh_list_sessions,
+        ssh_list_password_requests,
+        ssh_provide_password,
+        ssh_cancel_password_request,
+        ssh_get_permissibility_info,
+    ]
+
 def main():
     """Main entry point."""
-    if not MCP_AVAILABLE:
+    try:
+        from mcp.server.fastmcp import FastMCP
+    except ImportError:
         print("Error: MCP dependencies not available.")
         print("Install with: pip install modelcontextprotocol paramiko pyyaml python-dotenv")
         sys.exit(1)
     
-    # Create FastMCP app
+    # Create FastMCP app and register the tools
     mcp = FastMCP("Remote SSH Server")
-    
-    @mcp.tool()
-    async def ssh_connect(
-        host: Optional[str] = None,
-        port: Optional[int] = None,
-        username: Optional[str] = None,
-        session_id: Optional[str] = None,
-        auth: Optional[Dict[str, Any]] = None
-    ) -> Dict[str, Any]:
-        """Establish SSH connection to a remote host."""
-        handler = tool_handler_factory.create_handler('ssh_connect')
-        return await handler.execute(
-            host=host,
-            port=port,
-            username=username,
-            session_id=session_id,
-            auth=auth
-        )
-
-    @mcp.tool()
-    async def ssh_run(
-        session_id: str,
-        cmd: str,
-        input_data: Optional[str] = None,
-        timeout_ms: Optional[int] = None,
-        max_bytes: Optional[int] = None,
-        sudo_password: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """Execute a command in an existing SSH session."""
-        handler = tool_handler_factory.create_handler('ssh_run')
-        return await handler.execute(
-            session_id=session_id,
-            cmd=cmd,
-            input_data=input_data,
-            timeout_ms=timeout_ms,
-            max_bytes=max_bytes,
-            sudo_password=sudo_password
-        )
-
-    @mcp.tool()
-    async def ssh_disconnect(session_id: str) -> Dict[str, Any]:
-        """Disconnect SSH session."""
-        handler = tool_handler_factory.create_handler('ssh_disconnect')
-        return await handler.execute(session_id=session_id)
-
-    @mcp.tool()
-    async def ssh_list_sessions() -> Dict[str, Any]:
-        """List all active SSH sessions."""
-        handler = tool_handler_factory.create_handler('ssh_list_sessions')
-        return await handler.execute()
-
-    @mcp.tool()
-    async def ssh_list_password_requests() -> Dict[str, Any]:
-        """List all pending password requests."""
-        handler = tool_handler_factory.create_handler('ssh_list_password_requests')
-        return await handler.execute()
-
-    @mcp.tool()
-    async def ssh_provide_password(request_id: str, password: str) -> Dict[str, Any]:
-        """Provide a password for a pending request."""
-        handler = tool_handler_factory.create_handler('ssh_provide_password')
-        return await handler.execute(request_id=request_id, password=password)
-
-    @mcp.tool()
-    async def ssh_cancel_password_request(request_id: str) -> Dict[str, Any]:
-        """Cancel a pending password request."""
-        handler = tool_handler_factory.create_handler('ssh_cancel_password_request')
-        return await handler.execute(request_id=request_id)
-
-    @mcp.tool()
-    async def ssh_get_permissibility_info() -> Dict[str, Any]:
-        """Get information about current permissibility level and restrictions."""
-        handler = tool_handler_factory.create_handler('ssh_get_permissibility_info')
-        return await handler.execute()
-
-    # Cleanup task
-    async def cleanup_task():
-        """Background task to cleanup expired sessions."""
-        while True:
-            try:
-                await session_manager.cleanup_expired_sessions()
-                await asyncio.sleep(300)  # Run every 5 minutes
-            except Exception as e:
-                logger.error(f"Cleanup task error: {e}")
-                await asyncio.sleep(60)  # Retry after 1 minute
+    for tool in get_tools():
+        mcp.tool()(tool)
 
     if config.debug:
         logging.getLogger().setLevel(logging.DEBUG)
@@ -144,6 +188,15 @@ def main():
     logger.info(f"Permissibility level: {config.security.permissibility_level.value}")
     logger.info(f"Allowed commands: {len(config.security.get_allowed_commands())}")
     
+    # Use uvloop when installed; FastMCP runs through anyio.run, whose asyncio
+    # backend creates its loop from the installed policy
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        logger.info("Using uvloop event loop")
+    except ImportError:
+        pass
+    
     # Run the server
     mcp.run()
 
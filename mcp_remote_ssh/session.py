@@ -1,24 +1,122 @@
 """SSH session management with persistent shell state."""
 
 import asyncio
-import threading
 import time
 import logging
 import re
+import threading
 import base64
+import hashlib
 import os
-from typing import Dict, Optional, Tuple, Any, List
+import select
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple, Any, List, Iterator, Callable
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 import paramiko
 from paramiko import SSHClient, Channel, Transport
 from .config import get_config
 from .security import get_security_manager, CommandValidationResult
-from .password_handler import create_password_manager
+from .password_handler import PasswordManager, create_password_manager
 from .interactive_password_service import get_password_service
 
 logger = logging.getLogger(__name__)
 
+# SFTP WRITE payload size; matches the 32 KiB packet ceiling servers must accept
+_SFTP_CHUNK_SIZE = 32768
+
+# Blocking SFTP transfers run here, capped so large transfers can't starve the default executor
+_sftp_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sftp")
+
+# Blocking paramiko calls that wait on the server (handshake, channel requests,
+# isolated exec channels) run here so they don't stall the event loop
+_ssh_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="ssh-io")
+
+# Flow-control window and max packet for SFTP and isolated exec channels; paramiko's
+# ~2 MiB default window throttles bulk transfers on high-latency links. The shell
+# keeps the default: its reader stops at max_output_bytes, after which the window is
+# the only limit on what piles up for the next command to read.
+_CHANNEL_WINDOW_SIZE = 2 ** 27
+_CHANNEL_MAX_PACKET_SIZE = 2 ** 19
+
+# Bytes requested per channel read; large enough to take everything paramiko has
+# buffered from a bulk transfer in one call
+_RECV_CHUNK_SIZE = 262144
+
+# Exit status sentinel appended to every command (see _send_command)
+_COMMAND_PREFIX = b"set +e; "
+_COMMAND_SUFFIX = b"; echo __EXIT_STATUS:$?__\n"
+_EXIT_STATUS_RE = re.compile(rb'__EXIT_STATUS:(\d+)__\s*')
+# Numbered sentinel after each command of a batch except the last (see execute_commands)
+_BATCH_STATUS_RE = re.compile(rb'__EXIT_STATUS:(\d+):(\d+)__\s*')
+# Bytes before the last scanned position that are searched again, so a sentinel
+# split across two reads is still found
+_EXIT_STATUS_SCAN_OVERLAP = 64
+
+# Shell prompt line (ends in $ or #)
+_PROMPT_RE = re.compile(r'[\$#]\s*$', re.MULTILINE)
+# Bare prompt lines dropped from command output
+_PROMPT_LINES = frozenset(('$', '#'))
+# Prompts only appear at the end of the output, so _wait_for_prompt keeps just this much
+_PROMPT_SCAN_WINDOW = 256
+# A password prompt is waiting for input, so it is always at the end of the buffer
+_PASSWORD_PROMPT_SCAN_WINDOW = 512
+# Printed after the environment setup line, followed by the next prompt
+_SETUP_DONE_RE = re.compile(r'__SETUP_DONE__\s+[\$#]\s*$')
+# ssh_config-style tokens accepted in MCP_SSH_PROXY_COMMAND
+_PROXY_TOKEN_RE = re.compile(r'%([hpr%])')
+# systemctl/journalctl as a word of a command, which get pager flags (see _make_command_noninteractive)
+_PAGER_TOOL_RE = re.compile(r'(?<!\S)(systemctl|journalctl)(?!\S)')
+# SGR colour/style escape sequences
+_ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
+_ANSI_BYTES_RE = re.compile(rb'\x1b\[[0-9;]*m')
+
+# Sudo prompts that may be waiting for an end-of-line on stdout
+_SUDO_NUDGE_RE = re.compile(
+    r'\[sudo\] password for [^:]+:'
+    r'|password for [^:]+:'
+    r'|password:'
+    r'|sudo: a terminal is required to read the password'
+    r'|sudo: no tty present and no askpass program specified'
+    r'|PAM authentication error'
+    r'|Try again\.',
+    re.IGNORECASE
+)
+# Sudo prompts that require a password when no password manager is available
+_SUDO_PROMPT_RE = re.compile(
+    r'\[sudo\] password for [^:]+:'
+    r'|\[sudo\] password for [^:]*$'
+    r'|password:'
+    r'|sudo: a terminal is required to read the password'
+    r'|sudo: no tty present and no askpass program specified'
+    r'|We trust you have received the usual lecture from the local System',
+    re.IGNORECASE
+)
+
+# Longest wait for channel data before re-checking timers (hang/password logic)
+_IDLE_WAKEUP_SECONDS = 0.1
+
+def _is_sudo_command(command: str) -> bool:
+    """Check if a command runs under sudo, and so may prompt for a password."""
+    return command.lstrip().startswith('sudo')
+
+def parse_private_key(key_data: bytes) -> paramiko.PKey:
+    """Parse a PEM private key."""
+    from io import StringIO
+    return paramiko.RSAKey.from_private_key(StringIO(key_data.decode('utf-8')))
+
+def auth_fingerprint(auth_method: str, auth_kwargs: Dict[str, Any]) -> str:
+    """SHA-256 of the authentication method and credentials.
+    
+    Sessions only share a transport when their fingerprints match, so a session
+    never rides on a connection authenticated with someone else's credentials.
+    """
+    digest = hashlib.sha256(auth_method.encode('utf-8'))
+    for name in sorted(auth_kwargs):
+        digest.update(b'\0%s\0%s' % (name.encode('utf-8'), str(auth_kwargs[name]).encode('utf-8')))
+    return digest.hexdigest()
+
 @dataclass
 class CommandResult:
     """Result of executing a command."""
@@ -40,97 +138,223 @@ class SessionInfo:
     current_dir: str = "~"
     environment: Dict[str, str] = field(default_factory=dict)
 
+class _ExecutionContext:
+    """Parameters of a command (or batch) running in the shell."""
+    __slots__ = ('command', 'sanitized_command', 'start_time', 'timeout_seconds',
+                 'max_output_bytes', 'password_manager', 'sudo_password', 'is_sudo')
+    
+    def __init__(self, command: str, sanitized_command: str, start_time: float, timeout_seconds: float,
+                 max_output_bytes: int, password_manager: Optional[PasswordManager],
+                 sudo_password: Optional[str] = None, is_sudo: bool = False):
+        self.command = command
+        self.sanitized_command = sanitized_command
+        self.start_time = start_time
+        self.timeout_seconds = timeout_seconds
+        self.max_output_bytes = max_output_bytes
+        self.password_manager = password_manager
+        # Resolved sudo password (the sudo handler's), sent directly when proactive
+        self.sudo_password = sudo_password
+        # Whether any command run may prompt for a sudo password
+        self.is_sudo = is_sudo
+
+class _OutputState:
+    """Output of a running command, updated as chunks arrive."""
+    __slots__ = ('buffer', 'scan_offset', 'stderr', 'total_bytes', 'truncated',
+                 'exit_status', 'password_error', 'timeout_error', 'last_output_time')
+    
+    def __init__(self, buffer: Optional[bytearray] = None, stderr: Optional[bytearray] = None,
+                 exit_status: Optional[int] = None, truncated: bool = False,
+                 timeout_error: Optional[str] = None):
+        self.buffer = bytearray() if buffer is None else buffer
+        # Buffer length already searched for the exit status sentinel
+        self.scan_offset = 0
+        self.stderr = bytearray() if stderr is None else stderr
+        self.total_bytes = 0
+        self.truncated = truncated
+        self.exit_status = exit_status
+        self.password_error: Optional[str] = None
+        self.timeout_error = timeout_error
+        # Monotonic time output last arrived, for hang detection
+        self.last_output_time = time.monotonic()
+
 class SSHSession:
     """Manages a persistent SSH session with shell state."""
     
-    def __init__(self, session_id: str, host: str, port: int, username: str):
+    def __init__(self, session_id: str, host: str, port: int, username: str,
+                 transport: Optional[Transport] = None, auth_fingerprint: Optional[str] = None,
+                 key_loader: Optional[Callable[[str, bytes], paramiko.PKey]] = None):
         self.session_id = session_id
         self.host = host
         self.port = port
         self.username = username
+        # Fingerprint of the credentials this session connects with (see auth_fingerprint)
+        self.auth_fingerprint = auth_fingerprint
         self.client: Optional[SSHClient] = None
         self.channel: Optional[Channel] = None
         self.transport: Optional[Transport] = None
+        # Authenticated transport to the same host/user that this session can reuse
+        self._shared_transport = transport
+        # Parses PEM key material given its SHA-256; the manager's loader caches the result
+        self._key_loader = key_loader or (lambda digest, key_data: parse_private_key(key_data))
+        # SHA-256 of the PEM key this session connected with, if any
+        self.key_digest: Optional[str] = None
+        # SFTP client reused across transfers; opened lazily from executor threads
+        self._sftp: Optional[paramiko.SFTPClient] = None
+        self._sftp_lock = threading.Lock()
         self.connected = False
-        self.lock = threading.Lock()
-        self.last_used = datetime.now()
+        # Created on first use: before Python 3.10 an asyncio.Lock binds to the
+        # loop current at construction, which may not be the one running commands
+        self._lock: Optional[asyncio.Lock] = None
+        # Monotonic timestamp; converted to a datetime only for SessionInfo
+        self.last_used = time.monotonic()
+        self.connected_at: Optional[datetime] = None
         self.current_dir = "~"
         self.environment: Dict[str, str] = {}
-        self.prompt_pattern = re.compile(r'[\$#]\s*$', re.MULTILINE)
         self.config = get_config()
         self.security = get_security_manager()
+        # Sudo password used when a command doesn't pass one, with MCP_PASSWORD
+        # as the fallback; resolved once rather than per command
+        self._default_sudo_password = self.config.ssh.sudo_password or os.environ.get('MCP_PASSWORD')
         
+    @property
+    def lock(self) -> asyncio.Lock:
+        """Lock serialising commands on the session's shell."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+    
     async def connect(self, auth_method: str = "key", **auth_kwargs) -> bool:
         """Establish SSH connection with persistent shell."""
         try:
-            self.client = SSHClient()
-            self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            # Connection parameters
-            connect_kwargs = {
-                'hostname': self.host,
-                'port': self.port,
-                'username': self.username,
-                'timeout': self.config.ssh.connect_timeout,
-            }
-            
-            # Add ProxyCommand support if configured
-            proxy_command = self.config.ssh.proxy_command
-            if proxy_command:
-                # Replace %h with hostname
-                proxy_command = proxy_command.replace('%h', self.host)
-                connect_kwargs['sock'] = paramiko.ProxyCommand(proxy_command)
+            fingerprint = auth_fingerprint(auth_method, auth_kwargs)
+            if self.auth_fingerprint != fingerprint:
+                # The transport was picked for other credentials; authenticate our own
+                self._shared_transport = None
+            self.auth_fingerprint = fingerprint
             
-            # Authentication
-            if auth_method == "key":
-                if 'key_path' in auth_kwargs:
-                    connect_kwargs['key_filename'] = auth_kwargs['key_path']
-                elif 'key_pem_base64' in auth_kwargs:
-                    # Decode base64 key
-                    key_data = base64.b64decode(auth_kwargs['key_pem_base64'])
-                    # Create key object from string
-                    from io import StringIO
-                    key_file = StringIO(key_data.decode('utf-8'))
-                    connect_kwargs['pkey'] = paramiko.RSAKey.from_private_key(key_file)
-            elif auth_method == "password":
-                connect_kwargs['password'] = auth_kwargs.get('password')
-            
-            # Connect
-            await asyncio.get_event_loop().run_in_executor(
-                None, lambda: self.client.connect(**connect_kwargs)
-            )
-            
-            # Get transport and open shell channel
-            self.transport = self.client.get_transport()
-            if not self.transport:
-                raise Exception("Failed to get transport")
-            
-            self.channel = self.transport.open_session()
-            if not self.channel:
-                raise Exception("Failed to open channel")
+            if self._shared_transport is not None and self._shared_transport.is_active():
+                # Open a new channel on the existing connection; skips TCP, key exchange and auth
+                self.transport = self._shared_transport
+                logger.debug(f"Session {self.session_id} reusing transport to {self.username}@{self.host}")
+            else:
+                self._shared_transport = None
+                self.transport = await self._open_transport(auth_method, auth_kwargs)
             
-            # Request PTY and shell
-            self.channel.get_pty(term='xterm', width=120, height=30)
-            self.channel.invoke_shell()
+            # Open shell channel; each request waits for a server reply
+            self.channel = await asyncio.get_running_loop().run_in_executor(_ssh_executor, self._open_shell_sync)
             
-            # Wait for initial prompt and set up environment
-            await self._wait_for_prompt()
+            # No need to wait for the login prompt first: the setup line is buffered by
+            # the PTY until the shell reads it, and its marker comes after any banner
             await self._setup_environment()
             
             self.connected = True
+            self.connected_at = datetime.now()
             logger.info(f"SSH session {self.session_id} connected to {self.username}@{self.host}")
             
             return True
             
         except Exception as e:
             logger.error(f"Failed to connect SSH session {self.session_id}: {e}")
+            if self._shared_transport is not None:
+                self.release_transport()
             await self.disconnect()
             return False
     
+    def _open_shell_sync(self) -> Channel:
+        """Open a channel with a PTY and interactive shell (blocking)."""
+        channel = self.transport.open_session()
+        if not channel:
+            raise Exception("Failed to open channel")
+        
+        # A dumb terminal keeps colours, bracketed paste and other escape
+        # sequences out of the output; the wide width avoids wrapping.
+        try:
+            channel.get_pty(term='dumb', width=1000, height=30)
+            channel.invoke_shell()
+        except Exception:
+            channel.close()
+            raise
+        return channel
+    
+    async def _open_transport(self, auth_method: str, auth_kwargs: Dict[str, Any]) -> Transport:
+        """Connect and authenticate a new SSH transport."""
+        self.client = SSHClient()
+        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        
+        # Connection parameters
+        connect_kwargs = {
+            'hostname': self.host,
+            'port': self.port,
+            'username': self.username,
+            'timeout': self.config.ssh.connect_timeout,
+            'compress': self.config.ssh.compression,
+        }
+        
+        # Authentication. With explicit key material or a password, skip paramiko's
+        # agent and ~/.ssh key probing: each rejected key costs a round trip and
+        # counts against the server's MaxAuthTries.
+        key_pem_base64 = None
+        if auth_method == "key":
+            if 'key_path' in auth_kwargs:
+                connect_kwargs['key_filename'] = auth_kwargs['key_path']
+            elif 'key_pem_base64' in auth_kwargs:
+                key_pem_base64 = auth_kwargs['key_pem_base64']
+                connect_kwargs.update(allow_agent=False, look_for_keys=False)
+        elif auth_method == "password":
+            connect_kwargs['password'] = auth_kwargs.get('password')
+            connect_kwargs.update(allow_agent=False, look_for_keys=False)
+        
+        # Connect
+        await asyncio.get_running_loop().run_in_executor(
+            _ssh_executor, self._connect_client_sync, connect_kwargs, key_pem_base64
+        )
+        
+        transport = self.client.get_transport()
+        if not transport:
+            raise Exception("Failed to get transport")
+        
+        # Keepalives detect dead connections before they are reused
+        transport.set_keepalive(self.config.ssh.keepalive_interval)
+        # Commands are small writes sent while earlier packets (window adjusts,
+        # keepalives) may be unacknowledged; don't let Nagle hold them back
+        if isinstance(transport.sock, socket.socket):
+            transport.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        
+        return transport
+    
+    def _connect_client_sync(self, connect_kwargs: Dict[str, Any], key_pem_base64: Optional[str]) -> None:
+        """Build the key and proxy socket, then connect the client (blocking).
+        
+        Key parsing is CPU-bound and ProxyCommand starts a process, so both run
+        here rather than on the event loop.
+        """
+        if key_pem_base64:
+            key_data = base64.b64decode(key_pem_base64)
+            self.key_digest = hashlib.sha256(key_data).hexdigest()
+            connect_kwargs['pkey'] = self._key_loader(self.key_digest, key_data)
+        
+        # Add ProxyCommand support if configured. The proxy process carries a single
+        # TCP stream, so it can't be shared between connections; sessions to the same
+        # host and user avoid spawning another one by reusing the transport instead.
+        proxy_command = self.config.ssh.proxy_command
+        if proxy_command:
+            connect_kwargs['sock'] = paramiko.ProxyCommand(self._expand_proxy_command(proxy_command))
+        
+        self.client.connect(**connect_kwargs)
+    
+    def _expand_proxy_command(self, proxy_command: str) -> str:
+        """Substitute %h (host), %p (port), %r (user) and %% like ssh_config does."""
+        tokens = {'h': self.host, 'p': str(self.port), 'r': self.username, '%': '%'}
+        return _PROXY_TOKEN_RE.sub(lambda match: tokens[match.group(1)], proxy_command)
+    
     async def disconnect(self):
         """Close SSH connection."""
         self.connected = False
         
+        if self._sftp:
+            self._sftp.close()
+            self._sftp = None
+        
         if self.channel:
             self.channel.close()
             self.channel = None
@@ -145,17 +369,34 @@ class SSHSession:
             
         logger.info(f"SSH session {self.session_id} disconnected")
     
+    def release_transport(self) -> None:
+        """Detach from the transport so disconnect() leaves it open for other sessions."""
+        self.client = None
+        self.transport = None
+    
     async def execute_command(self, command: str, input_data: Optional[str] = None, 
                             timeout_ms: Optional[int] = None, 
                             max_bytes: Optional[int] = None,
-                            sudo_password: Optional[str] = None) -> CommandResult:
-        """Execute a command in the persistent shell."""
+                            sudo_password: Optional[str] = None,
+                            isolated: bool = False) -> CommandResult:
+        """Execute a command in the persistent shell.
+        
+        With isolated=True the command runs on its own exec channel instead, unless
+        it needs the shell for password prompts. It then doesn't see the shell's
+        working directory or environment.
+        """
         self._validate_session_state()
-        self._validate_command(command)
+        sanitized_command = self._validate_command(command)
         
-        execution_context = self._create_execution_context(command, timeout_ms, max_bytes, sudo_password)
+        # sudo may prompt for a password, which needs the PTY shell
+        if isolated and not _is_sudo_command(command):
+            return await self._execute_isolated(command, sanitized_command, input_data, timeout_ms, max_bytes)
         
-        with self.lock:
+        async with self.lock:
+            # Created under the lock so the timeout doesn't count time spent queued
+            execution_context = self._create_execution_context(command, sanitized_command, timeout_ms,
+                                                               max_bytes, sudo_password,
+                                                               _is_sudo_command(command))
             try:
                 self._send_command(execution_context)
                 output_data = await self._read_command_output(execution_context)
@@ -167,39 +408,176 @@ class SSHSession:
                 logger.error(f"Command execution failed in session {self.session_id}: {e}")
                 raise
     
+    async def execute_commands(self, commands: List[str], timeout_ms: Optional[int] = None,
+                               max_bytes: Optional[int] = None,
+                               sudo_password: Optional[str] = None) -> List[CommandResult]:
+        """Execute several commands in the persistent shell with a single round-trip.
+        
+        Timeout and output limits apply to the batch as a whole.
+        """
+        self._validate_session_state()
+        sanitized_commands = [self._validate_command(command) for command in commands]
+        if not commands:
+            return []
+        
+        async with self.lock:
+            # Any command of the batch, not just the first, may prompt for a password
+            is_sudo = any(_is_sudo_command(command) for command in commands)
+            execution_context = self._create_execution_context('; '.join(commands), '; '.join(sanitized_commands),
+                                                               timeout_ms, max_bytes, sudo_password, is_sudo)
+            try:
+                self._send_batch(sanitized_commands)
+                output_data = await self._read_command_output(execution_context)
+                results = self._create_batch_results(execution_context, output_data, len(commands))
+                for command, result in zip(commands, results):
+                    self._log_command_execution(command, result)
+                return results
+                
+            except Exception as e:
+                logger.error(f"Batch execution failed in session {self.session_id}: {e}")
+                raise
+    
+    def _send_batch(self, sanitized_commands: List[str]) -> None:
+        """Send a batch of validated commands to the SSH channel as a single line."""
+        # One line, so a command reading stdin can't swallow the commands after it
+        parts = []
+        for index, command in enumerate(sanitized_commands):
+            to_send = self._make_command_noninteractive(command)
+            parts.append(to_send.encode('utf-8'))
+            if index < len(sanitized_commands) - 1:
+                parts.append(b"; echo __EXIT_STATUS:%d:$?__; " % index)
+        self.channel.sendall(_COMMAND_PREFIX + b''.join(parts) + _COMMAND_SUFFIX)
+    
+    def _create_batch_results(self, context: _ExecutionContext, output_data: _OutputState,
+                              count: int) -> List[CommandResult]:
+        """Split batch output on the numbered sentinels into one result per command."""
+        if output_data.timeout_error is not None or output_data.password_error is not None:
+            return [self._create_command_result(context, output_data)] * count
+        
+        buffer = output_data.buffer
+        segments = []
+        start = 0
+        for match in _BATCH_STATUS_RE.finditer(buffer):
+            segments.append((buffer[start:match.start()], int(match.group(2))))
+            start = match.end()
+        # The last command's status was already taken from the regular sentinel
+        segments.append((buffer[start:], output_data.exit_status))
+        # Commands that never ran (timeout or output limit) get no output or status
+        segments.extend((bytearray(), None) for _ in range(count - len(segments)))
+        
+        results = []
+        for index, (segment, exit_status) in enumerate(segments[:count]):
+            # A PTY merges stderr into stdout; anything on the stderr channel goes last
+            stderr = output_data.stderr if index == count - 1 else None
+            segment_data = _OutputState(segment, stderr, exit_status, output_data.truncated)
+            results.append(self._create_command_result(context, segment_data))
+        return results
+    
+    async def _execute_isolated(self, command: str, sanitized_command: str, input_data: Optional[str],
+                                timeout_ms: Optional[int], max_bytes: Optional[int]) -> CommandResult:
+        """Execute a command on a dedicated exec channel with out-of-band exit status."""
+        start_time = time.monotonic()
+        timeout_seconds = (timeout_ms or self.config.security.command_timeout_seconds * 1000) / 1000
+        max_output_bytes = max_bytes or self.config.security.max_output_bytes
+        to_run = self._make_command_noninteractive(sanitized_command)
+        
+        stdout_bytes, stderr_bytes, exit_status, truncated, timed_out = await asyncio.get_running_loop().run_in_executor(
+            _ssh_executor, self._exec_sync, to_run, input_data, timeout_seconds, max_output_bytes
+        )
+        
+        self.last_used = time.monotonic()
+        
+        stdout = self.security.redact_secrets(stdout_bytes.decode('utf-8', errors='ignore'))
+        stderr = self.security.redact_secrets(stderr_bytes.decode('utf-8', errors='ignore'))
+        stdout, truncated = self._limit_output_lines(stdout, truncated)
+        if timed_out:
+            logger.warning(f"Isolated command timed out after {timeout_seconds}s in session {self.session_id}")
+            stderr += ('\n' if stderr else '') + f"Command timed out after {timeout_seconds}s"
+        
+        result = CommandResult(
+            stdout=stdout,
+            stderr=stderr,
+            exit_status=exit_status,
+            duration_ms=int((time.monotonic() - start_time) * 1000),
+            truncated=truncated,
+            session_id=self.session_id
+        )
+        self._log_command_execution(command, result)
+        return result
+    
+    def _exec_sync(self, command: str, input_data: Optional[str], timeout: float,
+                   max_size: int) -> Tuple[bytearray, bytearray, Optional[int], bool, bool]:
+        """Run a command on a new exec channel (blocking, run in an executor).
+        
+        Returns stdout, stderr, exit status (None on timeout or truncation), whether
+        output was truncated and whether the command timed out. stdout and stderr
+        together are kept within max_size.
+        """
+        # Closed after the command, so unread output can't outlive it
+        channel = self.transport.open_session(window_size=_CHANNEL_WINDOW_SIZE,
+                                              max_packet_size=_CHANNEL_MAX_PACKET_SIZE)
+        try:
+            channel.exec_command(command)
+            if input_data:
+                channel.sendall(input_data.encode('utf-8'))
+            channel.shutdown_write()
+            
+            stdout = bytearray()
+            stderr = bytearray()
+            end_time = time.monotonic() + timeout
+            while True:
+                if channel.recv_ready():
+                    stdout.extend(channel.recv(_RECV_CHUNK_SIZE))
+                elif channel.recv_stderr_ready():
+                    stderr.extend(channel.recv_stderr(_RECV_CHUNK_SIZE))
+                elif channel.eof_received or channel.closed:
+                    break
+                else:
+                    remaining = end_time - time.monotonic()
+                    if remaining <= 0:
+                        return stdout, stderr, None, False, True
+                    # The channel's fd becomes readable when stdout data or EOF
+                    # arrives, but not for stderr; wake periodically to drain it
+                    select.select([channel], [], [], min(remaining, _IDLE_WAKEUP_SECONDS))
+                    continue
+                
+                if len(stdout) + len(stderr) > max_size:
+                    del stdout[max_size:]
+                    del stderr[max_size - len(stdout):]
+                    return stdout, stderr, None, True, False
+            
+            # The exit status may trail EOF slightly; don't wait past the deadline
+            channel.status_event.wait(max(0.0, end_time - time.monotonic()))
+            exit_status = channel.recv_exit_status() if channel.exit_status_ready() else None
+            return stdout, stderr, exit_status, False, False
+        finally:
+            channel.close()
+    
     def _validate_session_state(self) -> None:
         """Validate that the session is connected and ready."""
         if not self.connected or not self.channel:
             raise Exception("Session not connected")
     
-    def _validate_command(self, command: str) -> None:
-        """Validate that the command is allowed to execute."""
+    def _validate_command(self, command: str) -> str:
+        """Validate that the command is allowed to execute and return it sanitized."""
         validation = self.security.validate_command(command)
         if not validation.allowed:
             raise Exception(f"Command not allowed: {validation.reason}")
+        return validation.sanitized_cmd
     
-    def _create_execution_context(self, command: str, timeout_ms: Optional[int], 
-                                max_bytes: Optional[int], sudo_password: Optional[str]) -> Dict[str, Any]:
+    def _create_execution_context(self, command: str, sanitized_command: str, timeout_ms: Optional[int], 
+                                max_bytes: Optional[int], sudo_password: Optional[str],
+                                is_sudo: bool) -> _ExecutionContext:
         """Create execution context with all necessary parameters."""
         logger.debug(f"Creating execution context for command: {command}")
-        logger.debug(f"Initial sudo_password parameter: {bool(sudo_password)}")
-        logger.debug(f"Config sudo_password: {bool(self.config.ssh.sudo_password)}")
-        logger.debug(f"MCP_PASSWORD env var: {bool(os.getenv('MCP_PASSWORD'))}")
-        
-        # Use sudo password from config if not provided explicitly
-        if not sudo_password and self.config.ssh.sudo_password:
-            sudo_password = self.config.ssh.sudo_password
-            logger.debug(f"Using sudo password from config for session {self.session_id}")
-        
-        # If still no sudo password, try MCP_PASSWORD as fallback
-        if not sudo_password:
-            mcp_password = os.getenv('MCP_PASSWORD')
-            if mcp_password:
-                sudo_password = mcp_password
-                logger.debug(f"Using MCP_PASSWORD as fallback for sudo in session {self.session_id}")
+        
+        # Use sudo password from config (or MCP_PASSWORD) if not provided explicitly
+        if not sudo_password and self._default_sudo_password:
+            sudo_password = self._default_sudo_password
+            logger.debug(f"Using default sudo password for session {self.session_id}")
         
         # Log password availability for debugging
-        if command.strip().startswith('sudo'):
+        if is_sudo:
             if sudo_password:
                 logger.debug(f"Sudo command detected with password available for session {self.session_id}")
                 logger.debug(f"Password length: {len(sudo_password)} characters")
@@ -243,387 +621,400 @@ class SSHSession:
         else:
             logger.debug(f"No password manager created for session {self.session_id}")
         
-        return {
-            'command': command,
-            'start_time': time.time(),
-            'timeout_seconds': (timeout_ms or self.config.security.command_timeout_seconds * 1000) / 1000,
-            'max_output_bytes': max_bytes or self.config.security.max_output_bytes,
-            'password_manager': password_manager,
-            'sanitized_command': self.security.validate_command(command).sanitized_cmd
-        }
+        return _ExecutionContext(
+            command=command,
+            sanitized_command=sanitized_command,
+            start_time=time.monotonic(),
+            timeout_seconds=(timeout_ms or self.config.security.command_timeout_seconds * 1000) / 1000,
+            max_output_bytes=max_bytes or self.config.security.max_output_bytes,
+            password_manager=password_manager,
+            sudo_password=sudo_password,
+            is_sudo=is_sudo
+        )
     
     def _make_command_noninteractive(self, cmd: str) -> str:
         """Transform command to avoid interactive hangs (sudo/systemctl/journalctl)."""
-        original = cmd
-        try:
-            stripped = cmd.strip()
-            logger.debug(f"Noninteractive transform input: '{original}'")
-            
-            # Check if we should force non-interactive sudo
-            force_noninteractive = getattr(self.config, 'force_noninteractive_sudo', False)
-            logger.debug(f"Force noninteractive sudo: {force_noninteractive}")
-            
-            # Ensure sudo is non-interactive if configured
-            if stripped.startswith('sudo ') and force_noninteractive:
-                parts = stripped.split()
-                # Insert -n right after sudo if not present
-                if '-n' not in parts[1:3]:
-                    parts.insert(1, '-n')
-                stripped = ' '.join(parts)
-                logger.debug(f"Added -n to sudo command: '{stripped}'")
-            
-            # Handle systemctl/journalctl commands more intelligently
-            # Only add --no-pager to the actual systemctl/journalctl command, not to pipes
-            if '|' in stripped:
-                # Split by pipe and process each part
-                parts = stripped.split('|')
-                processed_parts = []
-                logger.debug(f"Processing piped command with {len(parts)} parts")
-                for i, part in enumerate(parts):
-                    part = part.strip()
-                    logger.debug(f"Processing part {i}: '{part}'")
-                    # Only add --no-pager to systemctl/journalctl commands
-                    if any(tool in part for tool in ('systemctl', 'journalctl')):
-                        logger.debug(f"Found systemctl/journalctl in part {i}")
-                        if '--no-pager' not in part:
-                            part += ' --no-pager'
-                            logger.debug(f"Added --no-pager to part {i}")
-                        # Add --plain for systemctl
-                        if 'systemctl' in part and '--plain' not in part:
-                            part += ' --plain'
-                            logger.debug(f"Added --plain to part {i}")
-                    else:
-                        logger.debug(f"No systemctl/journalctl found in part {i}")
-                    processed_parts.append(part)
-                stripped = ' | '.join(processed_parts)
-                logger.debug(f"Processed piped command: '{stripped}'")
-            else:
-                # No pipes, process the whole command
-                for tool in ('systemctl', 'journalctl'):
-                    if f' {tool} ' in f' {stripped} ':
-                        if '--no-pager' not in stripped:
-                            stripped += ' --no-pager'
-                        # Prefer plain output to reduce control codes
-                        if tool == 'systemctl' and '--plain' not in stripped:
-                            stripped += ' --plain'
-                logger.debug(f"Processed non-piped command: '{stripped}'")
-            
-            logger.debug(f"Noninteractive transform output: '{stripped}'")
+        stripped = cmd.strip()
+        
+        # Ensure sudo is non-interactive if configured
+        if stripped.startswith('sudo ') and getattr(self.config, 'force_noninteractive_sudo', False):
+            parts = stripped.split()
+            # Insert -n right after sudo if not present
+            if '-n' not in parts[1:3]:
+                parts.insert(1, '-n')
+            stripped = ' '.join(parts)
+        
+        # Most commands never mention a pager-using tool; leave them untouched
+        if 'systemctl' not in stripped and 'journalctl' not in stripped:
             return stripped
-        except Exception as e:
-            logger.debug(f"Noninteractive transform failed for '{original}': {e}")
-            return original
+        
+        # Only add pager flags to the systemctl/journalctl part of a pipeline
+        transformed = ' | '.join(self._add_pager_flags(part.strip()) for part in stripped.split('|'))
+        logger.debug(f"Noninteractive transform: '{cmd}' -> '{transformed}'")
+        return transformed
+    
+    def _add_pager_flags(self, part: str) -> str:
+        """Append --no-pager (and --plain for systemctl) to a systemctl/journalctl command."""
+        match = _PAGER_TOOL_RE.search(part)
+        if not match:
+            return part
+        if '--no-pager' not in part:
+            part += ' --no-pager'
+        # Prefer plain output to reduce control codes
+        if match.group(1) == 'systemctl' and '--plain' not in part:
+            part += ' --plain'
+        return part
     
-    def _send_command(self, context: Dict[str, Any]) -> None:
+    def _send_command(self, context: _ExecutionContext) -> None:
         """Send the command to the SSH channel."""
         # Transform to avoid interactive behaviors
-        to_send = self._make_command_noninteractive(context['sanitized_command'])
-        cmd_with_status = f"set +e; {to_send}; echo __EXIT_STATUS:$?__"
-        self.channel.send(cmd_with_status + '\n')
+        to_send = self._make_command_noninteractive(context.sanitized_command)
+        self.channel.sendall(_COMMAND_PREFIX + to_send.encode('utf-8') + _COMMAND_SUFFIX)
     
-    async def _read_command_output(self, context: Dict[str, Any]) -> Dict[str, Any]:
+    async def _read_command_output(self, context: _ExecutionContext) -> _OutputState:
         """Read command output with timeout and password handling."""
-        output_data = {
-            'stdout_parts': [],
-            'stderr_parts': [],
-            'buffer': "",
-            'total_bytes': 0,
-            'truncated': False,
-            'exit_status': None
-        }
+        output_data = _OutputState()
         
-        end_time = time.time() + context['timeout_seconds']
-        last_output_time = time.time()
-        last_password_check_time = time.time()
+        end_time = time.monotonic() + context.timeout_seconds
+        last_password_check_time = time.monotonic()
         
         # For sudo commands, be more aggressive with password handling
-        is_sudo_command = context['command'].strip().startswith('sudo')
+        is_sudo_command = context.is_sudo
         sudo_password_sent = False
         initial_wait_time = 0.5  # Wait 0.5 seconds before first password attempt
         max_wait_time = 3.0  # Maximum time to wait before sending password proactively
         
-        while time.time() < end_time:
-            if self._is_hanging(last_output_time, context['start_time']):
+        while True:
+            # Sample the clock once per iteration; the checks below share it
+            now = time.monotonic()
+            if now >= end_time:
+                break
+            
+            if self._is_hanging(output_data):
                 # If hanging and we have a password manager, try proactive password handling
-                if context['password_manager'] and (time.time() - last_password_check_time) > 1:  # Reduced from 2 to 1 second
+                if context.password_manager and (now - last_password_check_time) > 1:  # Reduced from 2 to 1 second
                     logger.debug(f"Command hanging, attempting proactive password handling for session {self.session_id}")
                     await self._handle_password_prompts(context, output_data)
-                    last_password_check_time = time.time()
+                    last_password_check_time = time.monotonic()
                     # Give a bit more time after sending password
-                    last_output_time = time.time()
-                    await asyncio.sleep(0.1)
+                    output_data.last_output_time = time.monotonic()
+                    await self._wait_readable(0.1)
                     continue
                 else:
                     # Use sudo-specific timeout for sudo commands
                     if is_sudo_command:
-                        return self._create_sudo_timeout_result(context['start_time'], context['command'])
+                        return self._create_sudo_timeout_result(context.start_time, context.command)
                     else:
-                        return self._create_timeout_result(context['start_time'])
+                        return self._create_timeout_result(context.start_time)
+            
+            await self._process_stdout_chunk(context, output_data)
+            await self._process_stderr_chunk(context, output_data)
             
-            await self._process_stdout_chunk(context, output_data, last_output_time)
-            await self._process_stderr_chunk(context, output_data, last_output_time)
+            # A finished command needs none of the password handling below;
+            # running it anyway could type the password into the idle shell
+            if self._should_stop_reading(output_data, context):
+                break
             
             # Always check for password prompts if we have a password manager
-            if context['password_manager'] and (time.time() - last_password_check_time) > 0.5:
+            if context.password_manager and (now - last_password_check_time) > 0.5:
                 await self._handle_password_prompts(context, output_data)
-                last_password_check_time = time.time()
+                last_password_check_time = time.monotonic()
             
             # For sudo commands, use a more sophisticated timing strategy
-            if is_sudo_command and not sudo_password_sent and context['password_manager']:
-                current_time = time.time()
-                time_since_start = current_time - context['start_time']
-                
+            if is_sudo_command and not sudo_password_sent and context.password_manager:
+                time_since_start = now - context.start_time
+            
                 # Strategy 1: Wait for actual password prompt (preferred)
-                if 'password' in output_data['buffer'].lower() or '[sudo]' in output_data['buffer']:
+                tail = self._buffer_tail_text(output_data).lower()
+                if 'password' in tail or '[sudo]' in tail:
                     logger.debug(f"Password prompt detected in output, sending password for session {self.session_id}")
                     await self._handle_password_prompts(context, output_data)
                     sudo_password_sent = True
-                    last_password_check_time = time.time()
-                    await asyncio.sleep(0.2)
-                
+                    last_password_check_time = time.monotonic()
+                    await self._wait_readable(0.2)
+            
                 # Strategy 2: Proactive sending if no output after initial wait
-                elif time_since_start > initial_wait_time and not output_data['buffer'].strip():
+                elif time_since_start > initial_wait_time and self._buffer_is_blank(output_data):
                     logger.debug(f"Sudo command with no output after {time_since_start:.2f}s, sending password proactively for session {self.session_id}")
                     await self._handle_password_prompts(context, output_data)
                     sudo_password_sent = True
-                    last_password_check_time = time.time()
-                    await asyncio.sleep(0.2)
-                
+                    last_password_check_time = time.monotonic()
+                    await self._wait_readable(0.2)
+            
                 # Strategy 3: Last resort - send password after maximum wait time
                 elif time_since_start > max_wait_time:
                     logger.debug(f"Sudo command with no output after {time_since_start:.2f}s (max wait), sending password as last resort for session {self.session_id}")
                     await self._handle_password_prompts(context, output_data)
                     sudo_password_sent = True
-                    last_password_check_time = time.time()
-                    await asyncio.sleep(0.2)
+                    last_password_check_time = time.monotonic()
+                    await self._wait_readable(0.2)
             
             if self._should_stop_reading(output_data, context):
                 break
             
-            await asyncio.sleep(0.01)
+            # No more output can arrive once the shell has gone away. A command
+            # that ended the shell (e.g. 'exit 3') leaves its status on the
+            # channel; paramiko reports -1 when the server sent none.
+            if self._channel_drained():
+                if self.channel.exit_status_ready() and self.channel.recv_exit_status() >= 0:
+                    output_data.exit_status = self.channel.recv_exit_status()
+                logger.warning(f"Shell closed before command finished in session {self.session_id}")
+                break
+            
+            await self._wait_readable(min(_IDLE_WAKEUP_SECONDS, end_time - time.monotonic()))
         
+        if output_data.total_bytes > context.max_output_bytes:
+            output_data.truncated = True
         return output_data
     
-    def _is_hanging(self, last_output_time: float, start_time: float) -> bool:
-        """Check if command is hanging (no output for 10 seconds)."""
-        return time.time() - last_output_time > 10
+    def _channel_drained(self) -> bool:
+        """Check whether the channel is closed (or at EOF) with nothing left to read."""
+        channel = self.channel
+        return ((channel.closed or channel.eof_received)
+                and not channel.recv_ready() and not channel.recv_stderr_ready())
     
-    def _create_timeout_result(self, start_time: float) -> Dict[str, Any]:
+    async def _wait_readable(self, timeout: float) -> None:
+        """Wait until the channel has data or the timeout elapses.
+        
+        The channel is registered with the event loop only for the wait; left
+        registered while the caller awaits something else (a password callback),
+        unread data would wake the loop on every iteration.
+        """
+        if timeout <= 0:
+            return
+        # A closed channel's fd stays readable forever, so don't wait on it
+        if self.channel.closed or self.channel.eof_received:
+            await asyncio.sleep(min(timeout, 0.01))
+            return
+        loop = asyncio.get_running_loop()
+        data_ready = asyncio.Event()
+        try:
+            fd = self.channel.fileno()
+            loop.add_reader(fd, data_ready.set)
+        except (AttributeError, TypeError, ValueError, OSError, NotImplementedError):
+            # No pollable file descriptor
+            await asyncio.sleep(min(timeout, 0.01))
+            return
+        try:
+            await asyncio.wait_for(data_ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            loop.remove_reader(fd)
+    
+    def _is_hanging(self, output_data: _OutputState) -> bool:
+        """Check if command is hanging (no output for the configured threshold)."""
+        return time.monotonic() - output_data.last_output_time > self.config.ssh.hang_threshold_seconds
+    
+    def _create_timeout_result(self, start_time: float) -> _OutputState:
         """Create timeout result when command is hanging."""
-        logger.warning(f"Command appears to be hanging (no output for 10s) in session {self.session_id}")
-        return {
-            'stdout_parts': [],
-            'stderr_parts': [],
-            'buffer': "",
-            'total_bytes': 0,
-            'truncated': False,
-            'exit_status': 1,
-            'timeout_error': "Command timed out - may be waiting for input. Check if password is required."
-        }
+        logger.warning(f"Command appears to be hanging (no output for {self.config.ssh.hang_threshold_seconds}s) in session {self.session_id}")
+        return _OutputState(
+            exit_status=1,
+            timeout_error="Command timed out - may be waiting for input. Check if password is required."
+        )
     
-    def _create_sudo_timeout_result(self, start_time: float, command: str) -> Dict[str, Any]:
+    def _create_sudo_timeout_result(self, start_time: float, command: str) -> _OutputState:
         """Create timeout result specifically for sudo commands."""
-        logger.warning(f"Sudo command appears to be hanging (no output for 10s) in session {self.session_id}: {command}")
-        return {
-            'stdout_parts': [],
-            'stderr_parts': [],
-            'buffer': "",
-            'total_bytes': 0,
-            'truncated': False,
-            'exit_status': 1,
-            'timeout_error': f"Sudo command timed out: {command}. Ensure sudo password is configured correctly."
-        }
+        logger.warning(f"Sudo command appears to be hanging (no output for {self.config.ssh.hang_threshold_seconds}s) in session {self.session_id}: {command}")
+        return _OutputState(
+            exit_status=1,
+            timeout_error=f"Sudo command timed out: {command}. Ensure sudo password is configured correctly."
+        )
     
-    async def _process_stdout_chunk(self, context: Dict[str, Any], output_data: Dict[str, Any], 
-                                  last_output_time: float) -> None:
+    async def _process_stdout_chunk(self, context: _ExecutionContext, output_data: _OutputState) -> None:
         """Process a chunk of stdout data."""
         if not self.channel.recv_ready():
             return
         
-        chunk = self.channel.recv(4096).decode('utf-8', errors='ignore')
-        output_data['buffer'] += chunk
-        output_data['total_bytes'] += len(chunk)
-        last_output_time = time.time()
+        # Drain everything already buffered so the prompt and exit status checks
+        # below run once per wakeup rather than once per recv
+        buffer = output_data.buffer
+        start = len(buffer)
+        while self.channel.recv_ready() and output_data.total_bytes <= context.max_output_bytes:
+            data = self.channel.recv(_RECV_CHUNK_SIZE)
+            if not data:
+                break
+            buffer.extend(data)
+            output_data.total_bytes += len(data)
+        output_data.last_output_time = time.monotonic()
         
         # Check for password-related errors
-        if context['command'].strip().startswith('sudo'):
+        if context.is_sudo:
             # Check if password was interpreted as a command
-            if 'command not found' in chunk.lower() and context.get('password_manager'):
+            if context.password_manager and buffer.find(b'command not found', start) >= 0:
                 # This might indicate the password was sent at the wrong time
                 logger.warning(f"Possible password timing issue detected in session {self.session_id}: 'command not found' in output")
-            # If sudo prompt persists, sometimes a newline helps flush
-            sudo_prompt_patterns = [
-                r'\[sudo\] password for [^:]+:',
-                r'password for [^:]+:',
-                r'Password:',
-                r'password:',
-                r'sudo: a terminal is required to read the password',
-                r'sudo: no tty present and no askpass program specified',
-                r'PAM authentication error',
-                r'Try again\.'
-            ]
+            # If sudo prompt persists, sometimes a newline helps flush. A prompt
+            # waiting for input is at the end, so only the new tail is decoded
+            tail = buffer[max(start, len(buffer) - _PASSWORD_PROMPT_SCAN_WINDOW):]
             try:
-                for p in sudo_prompt_patterns:
-                    if re.search(p, chunk, re.IGNORECASE):
-                        # Nudge terminal in case it's waiting for EOL
-                        self.channel.send('\n')
-                        break
+                if _SUDO_NUDGE_RE.search(tail.decode('utf-8', errors='ignore')):
+                    # Nudge terminal in case it's waiting for EOL
+                    self.channel.send('\n')
             except Exception:
                 pass
         
-        await self._handle_password_prompts(context, output_data)
+        # Output ending in the exit status can't be waiting at a password prompt
         self._check_exit_status(output_data)
+        if output_data.exit_status is None:
+            await self._handle_password_prompts(context, output_data)
     
-    async def _process_stderr_chunk(self, context: Dict[str, Any], output_data: Dict[str, Any], 
-                                  last_output_time: float) -> None:
+    async def _process_stderr_chunk(self, context: _ExecutionContext, output_data: _OutputState) -> None:
         """Process a chunk of stderr data."""
         if not self.channel.recv_stderr_ready():
             return
         
-        stderr_chunk = self.channel.recv_stderr(4096).decode('utf-8', errors='ignore')
-        output_data['stderr_parts'].append(stderr_chunk)
-        output_data['total_bytes'] += len(stderr_chunk)
-        last_output_time = time.time()
+        # Drain like stdout; decoded once at the end, so a character split across
+        # reads survives
+        while self.channel.recv_stderr_ready() and output_data.total_bytes <= context.max_output_bytes:
+            stderr_chunk = self.channel.recv_stderr(_RECV_CHUNK_SIZE)
+            if not stderr_chunk:
+                break
+            output_data.stderr.extend(stderr_chunk)
+            output_data.total_bytes += len(stderr_chunk)
+        output_data.last_output_time = time.monotonic()
     
-    async def _handle_password_prompts(self, context: Dict[str, Any], output_data: Dict[str, Any]) -> None:
+    async def _handle_password_prompts(self, context: _ExecutionContext, output_data: _OutputState) -> None:
         """Handle password prompts in the output."""
-        if context['password_manager']:
+        if context.password_manager:
             await self._handle_password_with_manager(context, output_data)
         else:
             self._check_for_password_prompt_without_manager(context, output_data)
     
-    async def _handle_password_with_manager(self, context: Dict[str, Any], output_data: Dict[str, Any]) -> None:
+    async def _handle_password_with_manager(self, context: _ExecutionContext, output_data: _OutputState) -> None:
         """Handle password prompt using password manager."""
-        prompt_context = {
-            "session_id": self.session_id,
-            "command": context['command'],
-            "host": self.host,
-            "username": self.username
-        }
-        
         # Check if this is a sudo command and we have a password manager
-        if context['command'].strip().startswith('sudo') and context.get('password_manager'):
+        if context.is_sudo and context.password_manager:
             # For sudo commands, be more aggressive in password handling
             logger.debug(f"Sudo command detected, checking for password prompt in session {self.session_id}")
             
             # Check if we've been waiting for a while without output
-            if not output_data['buffer'].strip():
+            if context.sudo_password and self._buffer_is_blank(output_data):
                 # Try sending the password proactively for sudo commands
-                # Get the sudo password from the password manager
-                sudo_handler = context['password_manager'].get_handler_for_type('sudo')
-                if sudo_handler and hasattr(sudo_handler, 'sudo_password') and sudo_handler.sudo_password:
-                    logger.info(f"Proactively sending sudo password for session {self.session_id} (command: {context['command']})")
-                    # Send password with proper newline and flush
-                    self.channel.send(sudo_handler.sudo_password + '\n')
-                    # Clear the buffer to avoid re-processing the same prompt
-                    output_data['buffer'] = ""
-                    return
-                else:
-                    # Try to get password from any handler that can handle sudo
-                    for handler in context['password_manager'].handlers:
-                        if handler.can_handle('sudo') and hasattr(handler, 'sudo_password') and handler.sudo_password:
-                            logger.info(f"Proactively sending sudo password from {handler.__class__.__name__} for session {self.session_id}")
-                            # Send password with proper newline and flush
-                            self.channel.send(handler.sudo_password + '\n')
-                            # Clear the buffer to avoid re-processing the same prompt
-                            output_data['buffer'] = ""
-                            return
-        
-        password_response = await context['password_manager'].detect_and_handle_prompt(
-            output_data['buffer'], prompt_context
+                logger.info(f"Proactively sending sudo password for session {self.session_id} (command: {context.command})")
+                # Send password with proper newline and flush
+                self.channel.send(context.sudo_password + '\n')
+                # Clear the buffer to avoid re-processing the same prompt
+                self._clear_buffer(output_data)
+                return
+        
+        # Not every prompt ends in ':' (e.g. the sudo lecture), so no cheaper gate
+        # here; the manager's combined pattern already rejects prompt-free output
+        # in a single scan of the tail
+        tail = self._buffer_tail_text(output_data)
+        prompt_context = {
+            "session_id": self.session_id,
+            "command": context.command,
+            "host": self.host,
+            "username": self.username
+        }
+        password_response = await context.password_manager.detect_and_handle_prompt(
+            tail, prompt_context
         )
         
         if password_response and password_response.password:
-            logger.info(f"Sending password for session {self.session_id} (command: {context['command']})")
+            logger.info(f"Sending password for session {self.session_id} (command: {context.command})")
             # Send password with proper newline and flush
             self.channel.send(password_response.password + '\n')
             # Clear the buffer to avoid re-processing the same prompt
-            output_data['buffer'] = ""
+            self._clear_buffer(output_data)
         elif password_response and password_response.error:
             logger.warning(f"Password handling error in session {self.session_id}: {password_response.error}")
-            output_data['password_error'] = password_response.error
-            output_data['exit_status'] = 1
+            output_data.password_error = password_response.error
+            output_data.exit_status = 1
         elif password_response and password_response.cancelled:
             logger.info(f"Password request cancelled for session {self.session_id}")
-            output_data['password_error'] = "Password request was cancelled"
-            output_data['exit_status'] = 1
+            output_data.password_error = "Password request was cancelled"
+            output_data.exit_status = 1
     
-    def _check_for_password_prompt_without_manager(self, context: Dict[str, Any], output_data: Dict[str, Any]) -> None:
+    def _check_for_password_prompt_without_manager(self, context: _ExecutionContext, output_data: _OutputState) -> None:
         """Check for password prompt when no password manager is available."""
-        sudo_patterns = [
-            r'\[sudo\] password for [^:]+:',
-            r'\[sudo\] password for [^:]*$',
-            r'Password:',
-            r'password:',
-            r'sudo: a terminal is required to read the password',
-            r'sudo: no tty present and no askpass program specified',
-            r'We trust you have received the usual lecture from the local System',
-        ]
+        tail = self._buffer_tail_text(output_data)
+        if _SUDO_PROMPT_RE.search(tail):
+            logger.warning(f"Password prompt detected but no password provided for session {self.session_id}")
+            output_data.password_error = "Password required but not provided. Use sudo_password parameter or set MCP_SSH_SUDO_PASSWORD environment variable."
+            output_data.exit_status = 1
+    
+    def _check_exit_status(self, output_data: _OutputState) -> None:
+        """Check the newly received output for the exit status marker."""
+        buffer = output_data.buffer
+        start = max(0, output_data.scan_offset - _EXIT_STATUS_SCAN_OVERLAP)
+        output_data.scan_offset = len(buffer)
+        # A plain substring search rules out most chunks before the regex runs
+        index = buffer.find(b'__EXIT_STATUS:', start)
+        if index < 0:
+            return
+        match = _EXIT_STATUS_RE.search(buffer, index)
+        if match:
+            output_data.exit_status = int(match.group(1))
+            del buffer[match.start():match.end()]
+    
+    def _clear_buffer(self, output_data: _OutputState) -> None:
+        """Discard buffered stdout (e.g. an answered prompt) and restart sentinel scanning.
         
-        for pattern in sudo_patterns:
-            if re.search(pattern, output_data['buffer'], re.IGNORECASE):
-                logger.warning(f"Password prompt detected but no password provided for session {self.session_id}")
-                output_data['password_error'] = "Password required but not provided. Use sudo_password parameter or set MCP_SSH_SUDO_PASSWORD environment variable."
-                output_data['exit_status'] = 1
-                break
+        In a batch, output up to the last numbered sentinel belongs to commands
+        that already finished, so only what follows it is dropped.
+        """
+        buffer = output_data.buffer
+        keep = 0
+        if buffer.find(b'__EXIT_STATUS:') >= 0:
+            for match in _BATCH_STATUS_RE.finditer(buffer):
+                keep = match.end()
+        del buffer[keep:]
+        output_data.scan_offset = keep
+    
+    def _buffer_is_blank(self, output_data: _OutputState) -> bool:
+        """Check whether stdout so far is only whitespace, without copying the buffer."""
+        buffer = output_data.buffer
+        return not buffer or buffer.isspace()
     
-    def _check_exit_status(self, output_data: Dict[str, Any]) -> None:
-        """Check for exit status marker in output."""
-        if '__EXIT_STATUS:' in output_data['buffer']:
-            match = re.search(r'__EXIT_STATUS:(\d+)__', output_data['buffer'])
-            if match:
-                output_data['exit_status'] = int(match.group(1))
-                output_data['buffer'] = re.sub(r'__EXIT_STATUS:\d+__\s*', '', output_data['buffer'])
+    def _buffer_tail_text(self, output_data: _OutputState) -> str:
+        """Decode the end of the raw stdout buffer for text-based prompt matching."""
+        return output_data.buffer[-_PASSWORD_PROMPT_SCAN_WINDOW:].decode('utf-8', errors='ignore')
     
-    def _should_stop_reading(self, output_data: Dict[str, Any], context: Dict[str, Any]) -> bool:
+    def _should_stop_reading(self, output_data: _OutputState, context: _ExecutionContext) -> bool:
         """Determine if we should stop reading output."""
-        return (output_data['exit_status'] is not None or 
-                output_data['total_bytes'] > context['max_output_bytes'] or
-                'password_error' in output_data or
-                'timeout_error' in output_data)
+        return (output_data.exit_status is not None or 
+                output_data.total_bytes > context.max_output_bytes or
+                output_data.password_error is not None or
+                output_data.timeout_error is not None)
     
-    def _create_command_result(self, context: Dict[str, Any], output_data: Dict[str, Any]) -> CommandResult:
+    def _create_command_result(self, context: _ExecutionContext, output_data: _OutputState) -> CommandResult:
         """Create CommandResult from execution context and output data."""
-        if 'timeout_error' in output_data:
+        if output_data.timeout_error is not None:
             return CommandResult(
                 stdout="",
-                stderr=output_data['timeout_error'],
+                stderr=output_data.timeout_error,
                 exit_status=1,
-                duration_ms=int((time.time() - context['start_time']) * 1000),
+                duration_ms=int((time.monotonic() - context.start_time) * 1000),
                 truncated=False,
                 session_id=self.session_id
             )
         
-        if 'password_error' in output_data:
+        if output_data.password_error is not None:
             return CommandResult(
                 stdout="",
-                stderr=output_data['password_error'],
+                stderr=output_data.password_error,
                 exit_status=1,
-                duration_ms=int((time.time() - context['start_time']) * 1000),
+                duration_ms=int((time.monotonic() - context.start_time) * 1000),
                 truncated=False,
                 session_id=self.session_id
             )
         
-        stdout = self._clean_output(output_data['buffer'])
-        stderr = ''.join(output_data['stderr_parts'])
+        stdout, truncated = self._finalize_output(output_data.buffer, output_data.truncated)
+        stderr = self.security.redact_secrets(output_data.stderr.decode('utf-8', errors='ignore'))
         
         # Update last used time
-        self.last_used = datetime.now()
+        self.last_used = time.monotonic()
         
         # Calculate duration
-        duration_ms = int((time.time() - context['start_time']) * 1000)
-        
-        # Redact secrets from output
-        stdout = self.security.redact_secrets(stdout)
-        stderr = self.security.redact_secrets(stderr)
-        
-        # Limit output lines
-        stdout, truncated = self._limit_output_lines(stdout, output_data['truncated'])
+        duration_ms = int((time.monotonic() - context.start_time) * 1000)
         
         return CommandResult(
             stdout=stdout,
             stderr=stderr,
-            exit_status=output_data['exit_status'],
+            exit_status=output_data.exit_status,
             duration_ms=duration_ms,
             truncated=truncated,
             session_id=self.session_id
@@ -631,16 +1022,17 @@ class SSHSession:
     
     def _limit_output_lines(self, stdout: str, already_truncated: bool) -> Tuple[str, bool]:
         """Limit stdout to maximum number of lines."""
-        stdout_lines = stdout.split('\n')
-        truncated = already_truncated
+        max_lines = self.config.security.max_output_lines
+        # Counting newlines is far cheaper than splitting, and most output fits
+        if stdout.count('\n') < max_lines:
+            return stdout, already_truncated
         
-        if len(stdout_lines) > self.config.security.max_output_lines:
-            stdout_lines = stdout_lines[:self.config.security.max_output_lines]
-            stdout_lines.append(f"... [output truncated after {self.config.security.max_output_lines} lines]")
-            stdout = '\n'.join(stdout_lines)
-            truncated = True
-        
-        return stdout, truncated
+        # Cut at the newline ending the last kept line; split() would also copy
+        # the whole discarded remainder into one more string
+        end = -1
+        for _ in range(max_lines):
+            end = stdout.find('\n', end + 1)
+        return stdout[:end] + f"\n... [output truncated after {max_lines} lines]", True
     
     def _log_command_execution(self, command: str, result: CommandResult) -> None:
         """Log command execution if safe to do so."""
@@ -649,7 +1041,7 @@ class SSHSession:
     
     async def upload_file(self, remote_path: str, content: bytes, mode: str = "644") -> bool:
         """Upload file content to remote system."""
-        if not self.connected or not self.client:
+        if not self.connected or not self.transport:
             raise Exception("Session not connected")
         
         # Validate path
@@ -658,16 +1050,10 @@ class SSHSession:
             raise Exception(f"Upload path not allowed: {path_validation.reason}")
         
         try:
-            sftp = self.client.open_sftp()
-            
-            # Write content to remote file
-            with sftp.file(path_validation.sanitized_cmd, 'wb') as f:
-                f.write(content)
-            
-            # Set file mode
-            sftp.chmod(path_validation.sanitized_cmd, int(mode, 8))
-            
-            sftp.close()
+            # SFTP calls block, so keep them off the event loop
+            await asyncio.get_running_loop().run_in_executor(
+                _sftp_executor, self._upload_sync, path_validation.sanitized_cmd, content, int(mode, 8)
+            )
             
             logger.info(f"Session {self.session_id} uploaded file: {remote_path}")
             return True
@@ -678,7 +1064,7 @@ class SSHSession:
     
     async def download_file(self, remote_path: str, max_bytes: Optional[int] = None) -> Optional[bytes]:
         """Download file content from remote system."""
-        if not self.connected or not self.client:
+        if not self.connected or not self.transport:
             raise Exception("Session not connected")
         
         # Validate path
@@ -689,18 +1075,10 @@ class SSHSession:
         max_size = max_bytes or self.config.security.max_output_bytes
         
         try:
-            sftp = self.client.open_sftp()
-            
-            # Check file size
-            file_stat = sftp.stat(path_validation.sanitized_cmd)
-            if file_stat.st_size > max_size:
-                raise Exception(f"File too large: {file_stat.st_size} bytes > {max_size} bytes")
-            
-            # Read file content
-            with sftp.file(path_validation.sanitized_cmd, 'rb') as f:
-                content = f.read(max_size)
-            
-            sftp.close()
+            # SFTP calls block, so keep them off the event loop
+            content = await asyncio.get_running_loop().run_in_executor(
+                _sftp_executor, self._download_sync, path_validation.sanitized_cmd, max_size
+            )
             
             logger.info(f"Session {self.session_id} downloaded file: {remote_path}")
             return content
@@ -709,28 +1087,83 @@ class SSHSession:
             logger.error(f"File download failed in session {self.session_id}: {e}")
             return None
     
-    async def _wait_for_prompt(self, timeout: float = 10.0):
-        """Wait for shell prompt to appear."""
-        end_time = time.time() + timeout
-        buffer = ""
+    def _upload_sync(self, path: str, content: bytes, mode: int) -> None:
+        """Write a remote file over SFTP (blocking, run in an executor)."""
+        sftp = self._get_sftp()
+        
+        # Write content to remote file. Pipelining sends the WRITE requests
+        # back-to-back and collects the acks on close instead of waiting a
+        # round-trip per chunk; memoryview slices avoid copying the payload.
+        with sftp.file(path, 'wb') as f:
+            f.set_pipelined(True)
+            view = memoryview(content)
+            for offset in range(0, len(view), _SFTP_CHUNK_SIZE):
+                f.write(view[offset:offset + _SFTP_CHUNK_SIZE])
+        
+        # Set file mode
+        sftp.chmod(path, mode)
+    
+    def _download_sync(self, path: str, max_size: int) -> bytes:
+        """Read a remote file over SFTP (blocking, run in an executor)."""
+        sftp = self._get_sftp()
+        
+        # Check file size
+        file_stat = sftp.stat(path)
+        if file_stat.st_size > max_size:
+            raise Exception(f"File too large: {file_stat.st_size} bytes > {max_size} bytes")
+        
+        # Read file content; prefetch keeps many READ requests in flight
+        # instead of waiting a round-trip per 32 KiB block
+        with sftp.file(path, 'rb') as f:
+            f.prefetch(file_stat.st_size)
+            # Collect into a bytearray: a sized read() grows paramiko's read
+            # buffer by bytes concatenation, which is quadratic in file size
+            content = bytearray()
+            while len(content) < max_size:
+                chunk = f.read(min(_SFTP_CHUNK_SIZE, max_size - len(content)))
+                if not chunk:
+                    break
+                content += chunk
+            # The file may have grown since stat; don't return a silently cut copy
+            if len(content) == max_size and f.read(1):
+                raise Exception(f"File too large: more than {max_size} bytes")
+            return bytes(content)
+    
+    def _get_sftp(self) -> paramiko.SFTPClient:
+        """Return the session's SFTP client, opening a new one if needed."""
+        with self._sftp_lock:
+            if self._sftp is None or self._sftp.get_channel().closed:
+                self._sftp = paramiko.SFTPClient.from_transport(self.transport,
+                                                                window_size=_CHANNEL_WINDOW_SIZE,
+                                                                max_packet_size=_CHANNEL_MAX_PACKET_SIZE)
+                # Fail a stalled transfer instead of blocking an executor thread forever
+                self._sftp.get_channel().settimeout(self.config.ssh.connect_timeout)
+            return self._sftp
+    
+    async def _wait_for_prompt(self, timeout: float = 10.0, pattern: re.Pattern = _PROMPT_RE) -> bool:
+        """Wait for shell prompt (or another pattern) to appear; False on timeout."""
+        end_time = time.monotonic() + timeout
+        tail = bytearray()
         
-        while time.time() < end_time:
+        while time.monotonic() < end_time:
             if self.channel.recv_ready():
-                chunk = self.channel.recv(1024).decode('utf-8', errors='ignore')
-                buffer += chunk
+                # Keep raw bytes and trim before decoding, so a large read (a
+                # long banner) isn't decoded just to keep its last few lines
+                tail += self.channel.recv(_RECV_CHUNK_SIZE)
+                del tail[:-_PROMPT_SCAN_WINDOW]
                 
                 # Look for common prompt patterns
-                if self.prompt_pattern.search(buffer):
-                    return
-                    
-            await asyncio.sleep(0.1)
+                if pattern.search(tail.decode('utf-8', errors='ignore')):
+                    return True
+            
+            await self._wait_readable(end_time - time.monotonic())
         
         logger.warning(f"Prompt not detected in session {self.session_id}")
+        return False
     
     async def _setup_environment(self):
         """Set up shell environment for better interaction."""
         setup_commands = [
-            "export TERM=xterm",
             "export PS1='$ '",  # Simple prompt
             "set +o emacs",     # Disable line editing
             "stty -echo",       # Disable echo for cleaner output
@@ -743,36 +1176,62 @@ class SSHSession:
             "export MANPAGER=cat",
         ]
         
-        for cmd in setup_commands:
-            try:
-                self.channel.send(cmd + '\n')
-                await asyncio.sleep(0.1)
-            except Exception as e:
-                logger.warning(f"Setup command failed: {cmd} - {e}")
+        # Send everything as one line and wait for its marker, so none of the setup
+        # output is left in the channel for the first command to pick up. The quotes
+        # keep the terminal's echo of this line from matching the marker.
+        setup_line = '; '.join(setup_commands) + "; echo __SETUP_''DONE__\n"
+        try:
+            self.channel.sendall(setup_line)
+        except Exception as e:
+            logger.warning(f"Environment setup failed: {e}")
+            return
+        if not await self._wait_for_prompt(pattern=_SETUP_DONE_RE):
+            logger.warning(f"Environment setup not confirmed in session {self.session_id}; output may include prompts or echoes")
     
     def _clean_output(self, output: str) -> str:
         """Clean command output by removing echoes and prompts."""
-        lines = output.split('\n')
+        if '\x1b' in output:
+            output = _ANSI_RE.sub('', output)
+        return '\n'.join(self._iter_clean_lines(output))
+    
+    def _iter_clean_lines(self, output: str) -> Iterator[str]:
+        """Yield stripped output lines, skipping blank lines and prompt lines."""
+        # A stripped line matches _PROMPT_RE at its start only if it is a bare
+        # prompt character, so a set lookup replaces a regex call per line
+        for line in map(str.strip, output.split('\n')):
+            if line and line not in _PROMPT_LINES:
+                yield line
+    
+    def _finalize_output(self, buffer: bytearray, already_truncated: bool) -> Tuple[str, bool]:
+        """Clean, line-limit and redact raw stdout in a single pass over its lines."""
+        # Strip ANSI escape sequences from the raw bytes, then decode once.
+        # Most output has none; the byte search is far cheaper than a regex pass.
+        if 0x1b in buffer:
+            buffer = _ANSI_BYTES_RE.sub(b'', buffer)
+        output = buffer.decode('utf-8', errors='ignore')
         
-        # Remove empty lines and prompt lines
-        cleaned_lines = []
-        for line in lines:
-            line = line.strip()
-            if line and not self.prompt_pattern.match(line):
-                # Remove ANSI escape sequences
-                line = re.sub(r'\x1b\[[0-9;]*m', '', line)
-                cleaned_lines.append(line)
+        max_lines = self.config.security.max_output_lines
+        truncated = already_truncated
+        lines = []
+        for line in self._iter_clean_lines(output):
+            if len(lines) == max_lines:
+                lines.append(f"... [output truncated after {max_lines} lines]")
+                truncated = True
+                break
+            lines.append(line)
         
-        return '\n'.join(cleaned_lines)
+        # Secret patterns never span lines, so redacting only the kept lines is safe
+        return self.security.redact_secrets('\n'.join(lines)), truncated
     
     def get_session_info(self) -> SessionInfo:
         """Get session information."""
+        now = datetime.now()
         return SessionInfo(
             session_id=self.session_id,
             host=self.host,
             username=self.username,
-            connected_at=datetime.now(),  # This should be stored when connecting
-            last_used=self.last_used,
+            connected_at=self.connected_at or now,
+            last_used=now - timedelta(seconds=time.monotonic() - self.last_used),
             current_dir=self.current_dir,
             environment=self.environment.copy()
         )
@@ -2,15 +2,29 @@
 
 import asyncio
 import logging
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
 from dataclasses import dataclass
 
-from .session import SSHSession, SessionInfo
+from paramiko import PKey, Transport
+
+from .session import SSHSession, SessionInfo, parse_private_key
 from .config import get_config
 
 logger = logging.getLogger(__name__)
 
+# Longest sleep between cleanup passes; dead connections are also looked for then
+_CLEANUP_INTERVAL_SECONDS = 300
+
+# Sessions sharing one transport. Each may hold a shell, an SFTP and an isolated
+# exec channel, and OpenSSH's default MaxSessions allows 10 channels per connection.
+_MAX_SESSIONS_PER_TRANSPORT = 3
+
+# Parsed private keys kept for reconnects; a key is also dropped with its last session
+_PKEY_CACHE_SIZE = 8
+
 @dataclass
 class SessionStats:
     """Statistics about session management."""
@@ -24,12 +38,23 @@ class SessionManager:
     
     def __init__(self):
         self.config = get_config()
-        self.sessions: Dict[str, SSHSession] = {}
-        self.session_creation_times: Dict[str, datetime] = {}
+        # Least recently used first, so the eviction candidate is always at the front
+        self.sessions: 'OrderedDict[str, SSHSession]' = OrderedDict()
+        # Monotonic creation timestamps, in creation order (oldest first)
+        self.session_creation_times: Dict[str, float] = {}
         self._cleanup_task: Optional[asyncio.Task] = None
+        # Parsed private keys by SHA-256 of the PEM data, least recently used first.
+        # Filled from executor threads while sessions connect, hence the lock.
+        self._pkey_cache: 'OrderedDict[str, PKey]' = OrderedDict()
+        self._pkey_lock = threading.Lock()
     
-    async def create_session(self, session_id: str, host: str, port: int, username: str) -> SSHSession:
-        """Create a new SSH session."""
+    async def create_session(self, session_id: str, host: str, port: int, username: str,
+                             auth_fingerprint: Optional[str] = None) -> SSHSession:
+        """Create a new SSH session.
+        
+        With the fingerprint of the credentials it will connect with, the session
+        may reuse a transport that was authenticated with the same credentials.
+        """
         if session_id in self.sessions:
             raise ValueError(f"Session '{session_id}' already exists")
         
@@ -37,16 +62,65 @@ class SessionManager:
             # Remove oldest session
             await self._remove_oldest_session()
         
-        session = SSHSession(session_id, host, port, username)
+        transport = None
+        if auth_fingerprint is not None:
+            transport = self._find_shared_transport(host, port, username, auth_fingerprint)
+        session = SSHSession(session_id, host, port, username,
+                             transport=transport, auth_fingerprint=auth_fingerprint,
+                             key_loader=self._load_private_key)
         self.sessions[session_id] = session
-        self.session_creation_times[session_id] = datetime.now()
+        self.session_creation_times[session_id] = time.monotonic()
+        self.start_cleanup_task()
         
         logger.info(f"Created session {session_id} for {username}@{host}:{port}")
         return session
     
+    def _find_shared_transport(self, host: str, port: int, username: str,
+                               auth_fingerprint: str) -> Optional[Transport]:
+        """Find a live transport to the same host/user and credentials that a new session can reuse.
+        
+        Transports already carrying _MAX_SESSIONS_PER_TRANSPORT sessions are skipped,
+        so further sessions open a new connection rather than hit the server's limit.
+        """
+        key = (host, port, username, auth_fingerprint)
+        users: Dict[Transport, int] = {}
+        candidates = []
+        for session in self.sessions.values():
+            # Sessions not yet connected will use the transport they were handed
+            transport = session.transport or session._shared_transport
+            if transport is None:
+                continue
+            users[transport] = users.get(transport, 0) + 1
+            if (session.connected and transport.is_active() and
+                    (session.host, session.port, session.username, session.auth_fingerprint) == key):
+                candidates.append(transport)
+        for transport in candidates:
+            if users[transport] < _MAX_SESSIONS_PER_TRANSPORT:
+                return transport
+        return None
+    
+    def _load_private_key(self, digest: str, key_data: bytes) -> PKey:
+        """Parse a PEM private key, reusing the result for identical key material."""
+        with self._pkey_lock:
+            pkey = self._pkey_cache.get(digest)
+            if pkey is not None:
+                self._pkey_cache.move_to_end(digest)
+                return pkey
+        
+        # Parsed outside the lock; it is CPU-bound and other sessions may be connecting
+        pkey = parse_private_key(key_data)
+        with self._pkey_lock:
+            self._pkey_cache[digest] = pkey
+            if len(self._pkey_cache) > _PKEY_CACHE_SIZE:
+                self._pkey_cache.popitem(last=False)
+        return pkey
+    
     def get_session(self, session_id: str) -> Optional[SSHSession]:
         """Get an existing session by ID."""
-        return self.sessions.get(session_id)
+        session = self.sessions.get(session_id)
+        if session is not None:
+            self.sessions.move_to_end(session_id)
+        return session
     
     async def remove_session(self, session_id: str) -> bool:
         """Remove a session by ID."""
@@ -54,12 +128,22 @@ class SessionManager:
             return False
         
         session = self.sessions[session_id]
+        if session.transport is not None and any(
+            other is not session and other.transport is session.transport
+            for other in self.sessions.values()
+        ):
+            # Other sessions still use this connection; only close our channel
+            session.release_transport()
         if session.connected:
             await session.disconnect()
         
         del self.sessions[session_id]
-        if session_id in self.session_creation_times:
-            del self.session_creation_times[session_id]
+        self.session_creation_times.pop(session_id, None)
+        if session.key_digest is not None and not any(
+            other.key_digest == session.key_digest for other in self.sessions.values()
+        ):
+            with self._pkey_lock:
+                self._pkey_cache.pop(session.key_digest, None)
         
         logger.info(f"Removed session {session_id}")
         return True
@@ -77,20 +161,17 @@ class SessionManager:
             return 0
         
         expired_count = 0
-        current_time = datetime.now()
-        max_age = timedelta(hours=self.config.security.session_timeout_hours)
+        current_time = time.monotonic()
+        max_age = self._max_session_age()
         
         sessions_to_remove = []
         
-        for session_id, session in self.sessions.items():
-            creation_time = self.session_creation_times.get(session_id)
-            if not creation_time:
-                continue
-            
-            age = current_time - creation_time
-            if age > max_age:
-                sessions_to_remove.append(session_id)
-                expired_count += 1
+        # Creation times are stored oldest first, so stop at the first unexpired one
+        for session_id, creation_time in self.session_creation_times.items():
+            if current_time - creation_time <= max_age:
+                break
+            sessions_to_remove.append(session_id)
+            expired_count += 1
         
         # Remove expired sessions
         for session_id in sessions_to_remove:
@@ -101,28 +182,44 @@ class SessionManager:
         
         return expired_count
     
+    async def disconnect_dead_sessions(self) -> int:
+        """Disconnect sessions whose SSH connection has dropped."""
+        dead_sessions = [
+            session for session in self.sessions.values()
+            if session.connected and (session.transport is None or not session.transport.is_active())
+        ]
+        
+        for session in dead_sessions:
+            logger.warning(f"Connection lost for session {session.session_id}, disconnecting")
+            await session.disconnect()
+        
+        return len(dead_sessions)
+    
     async def _remove_oldest_session(self) -> None:
-        """Remove the oldest session when at capacity."""
+        """Remove the least recently used session when at capacity."""
         if not self.sessions:
             return
         
-        oldest_session_id = min(
-            self.session_creation_times.keys(),
-            key=lambda sid: self.session_creation_times[sid]
-        )
+        oldest_session_id = next(iter(self.sessions))
         
-        logger.warning(f"Session limit reached, removing oldest session: {oldest_session_id}")
+        logger.warning(f"Session limit reached, removing least recently used session: {oldest_session_id}")
         await self.remove_session(oldest_session_id)
     
+    def _max_session_age(self) -> float:
+        """Session lifetime in seconds, read from config so runtime changes apply."""
+        return self.config.security.session_timeout_hours * 3600
+    
     def get_session_stats(self) -> SessionStats:
         """Get statistics about session management."""
-        current_time = datetime.now()
-        max_age = timedelta(hours=self.config.security.session_timeout_hours)
+        current_time = time.monotonic()
+        max_age = self._max_session_age()
         
+        # Creation times are stored oldest first, so only the expired prefix is visited
         expired_count = 0
         for creation_time in self.session_creation_times.values():
-            if current_time - creation_time > max_age:
-                expired_count += 1
+            if current_time - creation_time <= max_age:
+                break
+            expired_count += 1
         
         return SessionStats(
             total_sessions=len(self.sessions),
@@ -137,11 +234,11 @@ class SessionManager:
             return False
         
         creation_time = self.session_creation_times.get(session_id)
-        if not creation_time:
+        if creation_time is None:
             return False
         
-        current_time = datetime.now()
-        max_age = timedelta(hours=self.config.security.session_timeout_hours)
+        current_time = time.monotonic()
+        max_age = self._max_session_age()
         
         return current_time - creation_time <= max_age
     
@@ -171,12 +268,22 @@ class SessionManager:
             self._cleanup_task.cancel()
             logger.info("Stopped session cleanup task")
     
+    def _next_cleanup_delay(self) -> float:
+        """Seconds until the oldest session expires, capped at the cleanup interval."""
+        if not self.session_creation_times:
+            return _CLEANUP_INTERVAL_SECONDS
+        oldest = next(iter(self.session_creation_times.values()))
+        expires_in = oldest + self._max_session_age() - time.monotonic()
+        return max(1.0, min(_CLEANUP_INTERVAL_SECONDS, expires_in))
+    
     async def _cleanup_loop(self) -> None:
         """Background loop for cleaning up expired sessions."""
         while True:
             try:
-                await asyncio.sleep(300)  # Run every 5 minutes
+                await asyncio.sleep(self._next_cleanup_delay())
                 await self.cleanup_expired_sessions()
+                # Keepalives make dead connections show up as inactive transports
+                await self.disconnect_dead_sessions()
             except asyncio.CancelledError:
                 break
             except Exception as e:
@@ -185,10 +292,14 @@ class SessionManager:
 
 # Global session manager instance
 _session_manager: Optional[SessionManager] = None
+_session_manager_lock = threading.Lock()
 
 def get_session_manager() -> SessionManager:
     """Get the global session manager instance."""
     global _session_manager
     if _session_manager is None:
-        _session_manager = SessionManager()
+        # Checked again under the lock so concurrent first calls share one manager
+        with _session_manager_lock:
+            if _session_manager is None:
+                _session_manager = SessionManager()
     return _session_manager
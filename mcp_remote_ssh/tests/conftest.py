@@ -0,0 +1,15 @@
+"""Shared fixtures for the test suite."""
+
+import pytest
+from mcp_remote_ssh.security import SecurityManager
+
+@pytest.fixture(scope="session")
+def shared_security_manager():
+    """One SecurityManager for the whole run, so its patterns are built only once."""
+    return SecurityManager()
+
+@pytest.fixture
+def security_manager(shared_security_manager):
+    """The shared SecurityManager, with validation results from earlier tests dropped."""
+    shared_security_manager.clear_validation_cache()
+    return shared_security_manager
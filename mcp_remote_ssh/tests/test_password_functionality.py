@@ -1,33 +1,28 @@
-#!/usr/bin/env python3
-"""Test script for the new password functionality."""
+"""Tests for the interactive password functionality."""
 
-import asyncio
-import sys
-import os
-sys.path.append('..')
+import pytest
+from mcp_remote_ssh.interactive_password_service import (
+    InteractivePasswordService, get_password_service, PasswordRequest
+)
+from mcp_remote_ssh.password_handler import create_password_manager
+from mcp_remote_ssh.config import get_config
 
-from interactive_password_service import get_password_service, PasswordRequest
-from password_handler import create_password_manager
-from config import get_config
-
-async def test_password_service():
-    """Test the interactive password service."""
-    print("Testing Interactive Password Service...")
-    
-    # Get the password service
-    password_service = get_password_service()
+@pytest.fixture(scope="module")
+def password_service():
+    """The global password service, with a test callback registered once for the module."""
+    service = get_password_service()
+    previous_callback = service.password_callback
     
-    # Set up a simple callback that returns a test password
-    async def test_callback(request: PasswordRequest):
-        print(f"Password requested for: {request.prompt_text}")
-        print(f"Session: {request.session_id}")
-        print(f"Host: {request.host}")
-        print(f"Command: {request.command}")
+    def test_callback(request: PasswordRequest):
         return "test_password_123"
     
-    password_service.set_password_callback(test_callback)
-    
-    # Test requesting a password
+    service.set_password_callback(test_callback)
+    yield service
+    service.set_password_callback(previous_callback)
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_password_service(password_service):
+    """Test the interactive password service."""
     password = await password_service.request_password(
         prompt_text="[sudo] password for user:",
         prompt_type="sudo",
@@ -37,19 +32,34 @@ async def test_password_service():
         command="sudo systemctl status k3s"
     )
     
-    print(f"Received password: {password}")
+    assert password == "test_password_123"
+    # Answered requests are not left pending
+    assert password_service.get_pending_requests() == {}
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_password_service_awaits_async_callback():
+    """Test that a callback returning an awaitable has its result awaited."""
+    class AsyncCallback:
+        async def __call__(self, request: PasswordRequest):
+            return "async_password_789"
     
-    # Test listing pending requests
-    pending = password_service.get_pending_requests()
-    print(f"Pending requests: {len(pending)}")
+    password_service = InteractivePasswordService()
+    password_service.set_password_callback(AsyncCallback())
+    password = await password_service.request_password(
+        prompt_text="[sudo] password for user:",
+        prompt_type="sudo",
+        session_id="test_session",
+        host="test.host.com",
+        username="test_user",
+        command="sudo ls"
+    )
+    
+    assert password == "async_password_789"
 
+@pytest.mark.asyncio(loop_scope="session")
 async def test_password_manager():
     """Test the password manager with interactive support."""
-    print("\nTesting Password Manager...")
-    
-    # Create a password manager with interactive support
     async def test_callback(prompt, context):
-        print(f"Interactive callback called for: {prompt.prompt_text}")
         return "interactive_password_456"
     
     manager = create_password_manager(
@@ -58,34 +68,15 @@ async def test_password_manager():
         enable_interactive=True
     )
     
-    # Test detecting a password prompt
+    # The sudo handler is registered first, so it answers sudo prompts
     test_output = "[sudo] password for user:"
     context = {"session_id": "test", "command": "sudo ls"}
     
     response = await manager.detect_and_handle_prompt(test_output, context)
-    if response and response.password:
-        print(f"Password manager provided: {response.password}")
-    else:
-        print("Password manager did not provide password")
+    assert response is not None
+    assert response.password == "config_sudo_password"
 
-async def test_config():
+def test_config():
     """Test the configuration with password settings."""
-    print("\nTesting Configuration...")
-    
     config = get_config()
-    print(f"Interactive password enabled: {config.ssh.enable_interactive_password}")
-    print(f"Default password set: {config.ssh.default_password is not None}")
-    print(f"Sudo password set: {config.ssh.sudo_password is not None}")
-
-async def main():
-    """Main test function."""
-    print("=== Password Functionality Test ===\n")
-    
-    await test_config()
-    await test_password_service()
-    await test_password_manager()
-    
-    print("\n=== Test Complete ===")
-
-if __name__ == "__main__":
-    asyncio.run(main())
+    assert isinstance(config.ssh.enable_interactive_password, bool)
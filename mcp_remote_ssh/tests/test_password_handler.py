@@ -205,6 +205,28 @@ class TestPasswordManager:
         response = await manager.detect_and_handle_prompt(output, context)
         assert response is None
     
+    @pytest.mark.asyncio
+    async def test_handler_without_patterns_is_asked(self, manager, sudo_handler):
+        """Test that a handler not declaring its patterns still sees every output."""
+        class CustomHandler(PasswordHandler):
+            async def detect_prompt(self, output):
+                if "PIN:" in output:
+                    return PasswordPrompt(prompt_type="pin", prompt_text="PIN:", position=output.index("PIN:"))
+                return None
+
+            async def handle_prompt(self, prompt, context):
+                return PasswordResponse(password="1234")
+
+            def can_handle(self, prompt_type):
+                return prompt_type == "pin"
+
+        manager.add_handler(sudo_handler)
+        manager.add_handler(CustomHandler())
+
+        response = await manager.detect_and_handle_prompt("Enter PIN:", {"session_id": "test_session"})
+        assert response is not None
+        assert response.password == "1234"
+
     @pytest.mark.asyncio
     async def test_detect_and_handle_prompt_no_handlers(self, manager):
         """Test detecting prompts with no handlers."""
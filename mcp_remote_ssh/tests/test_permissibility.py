@@ -15,7 +15,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 from mcp_remote_ssh.config import PermissibilityLevel, SecurityConfig
 from mcp_remote_ssh.security import SecurityManager
 
-def test_basic_functionality():
+def test_basic_functionality(security_manager):
     """Test basic permissibility functionality."""
     print("🧪 Testing Basic Permissibility Functionality")
     print("=" * 50)
@@ -29,7 +29,6 @@ def test_basic_functionality():
     
     # Test 2: Command validation
     print("\n2. Testing command validation...")
-    security_manager = SecurityManager()
     
     # Test allowed commands
     allowed_commands = [
@@ -74,13 +73,11 @@ def test_basic_functionality():
         denied_patterns = config.get_denied_patterns()
         print(f"{level.value.upper()}: {len(allowed_cmds)} commands, {len(denied_patterns)} patterns")
 
-def test_edge_cases():
+def test_edge_cases(security_manager):
     """Test edge cases and error handling."""
     print("\n🧪 Testing Edge Cases")
     print("=" * 30)
     
-    security_manager = SecurityManager()
-    
     # Test empty command
     result = security_manager.validate_command("")
     assert not result.allowed
@@ -106,8 +103,9 @@ def main():
     print()
     
     try:
-        test_basic_functionality()
-        test_edge_cases()
+        security_manager = SecurityManager()
+        test_basic_functionality(security_manager)
+        test_edge_cases(security_manager)
         
         print("\n✅ All tests passed!")
         print("\n📚 Summary:")
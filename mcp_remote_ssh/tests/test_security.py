@@ -1,11 +1,10 @@
 """Tests for security module."""
 
 import pytest
-from mcp_remote_ssh.security import SecurityManager, CommandValidationResult
+from mcp_remote_ssh.security import CommandValidationResult
+from mcp_remote_ssh.config import PermissibilityLevel
 
-@pytest.fixture
-def security_manager():
-    return SecurityManager()
+# security_manager is the shared, session-scoped instance from conftest.py
 
 class TestCommandValidation:
     """Test command validation logic."""
@@ -34,44 +33,55 @@ class TestCommandValidation:
         assert result.allowed is False
         assert "empty" in result.reason.lower()
     
-    def test_dangerous_patterns(self, security_manager):
-        """Test that dangerous patterns are detected."""
-        dangerous_commands = [
-            "ls && rm file",
-            "cat file | sh",
-            "ls; rm file",
-            "echo `whoami`",
-            "ls > /etc/passwd"
-        ]
+    def test_cached_result_follows_permissibility_level(self, security_manager, monkeypatch):
+        """Test that a cached validation is not reused after the level changes."""
+        monkeypatch.setattr(security_manager.config, "permissibility_level", PermissibilityLevel.MEDIUM)
+        assert security_manager.validate_command("sudo ls").allowed is False
         
-        for cmd in dangerous_commands:
-            result = security_manager.validate_command(cmd)
-            assert result.allowed is False, f"Command should be rejected: {cmd}"
+        monkeypatch.setattr(security_manager.config, "permissibility_level", PermissibilityLevel.HIGH)
+        assert security_manager.validate_command("sudo ls").allowed is True
     
-    def test_kubectl_validation(self, security_manager):
-        """Test kubectl command argument validation."""
-        valid_kubectl_commands = [
-            "kubectl get pods",
-            "kubectl describe service myservice",
-            "kubectl logs mypod",
-            "kubectl top nodes"
-        ]
+    def test_clear_validation_cache(self, security_manager, monkeypatch):
+        """Test that clearing the cache makes validation see config changes."""
+        assert security_manager.validate_command("ls -la").allowed is True
+        monkeypatch.setattr(security_manager.config, "always_denied_commands", ["ls"])
+        assert security_manager.validate_command("ls -la").allowed is True
         
-        for cmd in valid_kubectl_commands:
-            result = security_manager.validate_command(cmd)
-            assert result.allowed is True, f"Command should be allowed: {cmd}"
+        security_manager.clear_validation_cache()
+        assert security_manager.validate_command("ls -la").allowed is False
     
-    def test_systemctl_validation(self, security_manager):
+    @pytest.mark.parametrize("cmd", [
+        "ls && rm file",
+        "cat file | sh",
+        "ls; rm file",
+        "echo `whoami`",
+        "ls > /etc/passwd"
+    ])
+    def test_dangerous_patterns(self, security_manager, cmd):
+        """Test that dangerous patterns are detected."""
+        result = security_manager.validate_command(cmd)
+        assert result.allowed is False, f"Command should be rejected: {cmd}"
+    
+    @pytest.mark.parametrize("cmd", [
+        "kubectl get pods",
+        "kubectl describe service myservice",
+        "kubectl logs mypod",
+        "kubectl top nodes"
+    ])
+    def test_kubectl_validation(self, security_manager, cmd):
+        """Test kubectl command argument validation."""
+        result = security_manager.validate_command(cmd)
+        assert result.allowed is True, f"Command should be allowed: {cmd}"
+    
+    @pytest.mark.parametrize("cmd", [
+        "systemctl status nginx",
+        "systemctl is-active docker",
+        "systemctl list-units --type=service"
+    ])
+    def test_systemctl_validation(self, security_manager, cmd):
         """Test systemctl command argument validation."""
-        valid_systemctl_commands = [
-            "systemctl status nginx",
-            "systemctl is-active docker",
-            "systemctl list-units --type=service"
-        ]
-        
-        for cmd in valid_systemctl_commands:
-            result = security_manager.validate_command(cmd)
-            assert result.allowed is True, f"Command should be allowed: {cmd}"
+        result = security_manager.validate_command(cmd)
+        assert result.allowed is True, f"Command should be allowed: {cmd}"
 
 class TestSecretRedaction:
     """Test secret redaction functionality."""
@@ -106,36 +116,32 @@ class TestSecretRedaction:
 class TestPathValidation:
     """Test file path validation."""
     
-    def test_allowed_paths(self, security_manager):
+    @pytest.mark.parametrize("path", [
+        "/home/user/file.txt",
+        "/var/log/app.log",
+        "/tmp/tempfile",
+        "./local-file",
+        "../parent-file"
+    ])
+    def test_allowed_paths(self, security_manager, path):
         """Test that allowed paths pass validation."""
-        allowed_paths = [
-            "/home/user/file.txt",
-            "/var/log/app.log", 
-            "/tmp/tempfile",
-            "./local-file",
-            "../parent-file"
-        ]
-        
-        for path in allowed_paths:
-            result = security_manager.validate_file_path(path)
-            assert result.allowed is True, f"Path should be allowed: {path}"
+        result = security_manager.validate_file_path(path)
+        assert result.allowed is True, f"Path should be allowed: {path}"
     
-    def test_dangerous_paths(self, security_manager):
+    @pytest.mark.parametrize("path", [
+        "/etc/passwd",
+        "/proc/version",
+        "/sys/kernel",
+        "/dev/null",
+        "/boot/grub",
+        "~/.ssh/id_rsa",
+        "/root/.bashrc",
+        "../../../etc/passwd"
+    ])
+    def test_dangerous_paths(self, security_manager, path):
         """Test that dangerous paths are rejected."""
-        dangerous_paths = [
-            "/etc/passwd",
-            "/proc/version",
-            "/sys/kernel",
-            "/dev/null",
-            "/boot/grub",
-            "~/.ssh/id_rsa",
-            "/root/.bashrc",
-            "../../../etc/passwd"
-        ]
-        
-        for path in dangerous_paths:
-            result = security_manager.validate_file_path(path)
-            assert result.allowed is False, f"Path should be rejected: {path}"
+        result = security_manager.validate_file_path(path)
+        assert result.allowed is False, f"Path should be rejected: {path}"
     
     def test_empty_path(self, security_manager):
         """Test that empty paths are rejected."""
@@ -0,0 +1,296 @@
+"""Tests for command execution in SSHSession, driven through a scripted channel."""
+
+import asyncio
+import os
+import threading
+import time
+import pytest
+from unittest.mock import Mock
+from mcp_remote_ssh.config import PermissibilityLevel
+from mcp_remote_ssh.session import SSHSession
+
+class FakeChannel:
+    """Shell channel stand-in that answers each write with the next scripted output."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent = []
+        self.stdout = bytearray()
+        self.closed = False
+        self.eof_received = False
+
+    def sendall(self, data):
+        self.send(data)
+
+    def send(self, data):
+        self.sent.append(data if isinstance(data, bytes) else data.encode('utf-8'))
+        if self.responses:
+            self.stdout += self.responses.pop(0)
+        return len(data)
+
+    def recv_ready(self):
+        return bool(self.stdout)
+
+    def recv(self, size):
+        data = bytes(self.stdout[:size])
+        del self.stdout[:size]
+        return data
+
+    def recv_stderr_ready(self):
+        return False
+
+    def exit_status_ready(self):
+        return False
+
+class FakeExecChannel:
+    """Exec channel stand-in returning fixed output; without an exit status it never finishes."""
+
+    def __init__(self, stdout=b"", stderr=b"", exit_status=None):
+        self.stdout = bytearray(stdout)
+        self.stderr = bytearray(stderr)
+        self.exit_status = exit_status
+        self.eof_received = exit_status is not None
+        self.closed = False
+        self.status_event = threading.Event()
+        if exit_status is not None:
+            self.status_event.set()
+        # select() and add_reader need a real descriptor; write to it to make the channel readable
+        self._read_fd, self._write_fd = os.pipe()
+        self.command = None
+
+    def exec_command(self, command):
+        self.command = command
+
+    def sendall(self, data):
+        pass
+
+    def shutdown_write(self):
+        pass
+
+    def fileno(self):
+        return self._read_fd
+
+    def recv_ready(self):
+        return bool(self.stdout)
+
+    def recv(self, size):
+        data = bytes(self.stdout[:size])
+        del self.stdout[:size]
+        return data
+
+    def recv_stderr_ready(self):
+        return bool(self.stderr)
+
+    def recv_stderr(self, size):
+        data = bytes(self.stderr[:size])
+        del self.stderr[:size]
+        return data
+
+    def exit_status_ready(self):
+        return self.exit_status is not None
+
+    def recv_exit_status(self):
+        return self.exit_status
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            os.close(self._read_fd)
+            os.close(self._write_fd)
+
+@pytest.fixture
+def ssh_session(monkeypatch):
+    """A session marked connected, without a password manager unless a test passes a password."""
+    session = SSHSession("test-session", "localhost", 22, "testuser")
+    session.connected = True
+    session._default_sudo_password = None
+    monkeypatch.setattr(session.config.ssh, "enable_interactive_password", False)
+    return session
+
+class TestNoninteractiveCommands:
+    """Test the rewriting of commands that could wait on a pager."""
+
+    def test_noninteractive_pager_flags(self, ssh_session):
+        """Test that only systemctl/journalctl commands get pager flags."""
+        assert ssh_session._make_command_noninteractive(" ls -la ") == "ls -la"
+        assert (ssh_session._make_command_noninteractive("systemctl status nginx")
+                == "systemctl status nginx --no-pager --plain")
+        assert (ssh_session._make_command_noninteractive("journalctl -u nginx | tail -5")
+                == "journalctl -u nginx --no-pager | tail -5")
+
+class TestChannelWindows:
+    """Test which channels get the large flow-control window."""
+
+    def test_shell_keeps_default_window(self, ssh_session):
+        """Test that output left unread in the shell stays within paramiko's default window."""
+        ssh_session.transport = Mock()
+
+        ssh_session._open_shell_sync()
+
+        ssh_session.transport.open_session.assert_called_once_with()
+
+    def test_exec_channel_gets_large_window(self, ssh_session):
+        """Test that isolated exec channels, closed after each command, use the large window."""
+        ssh_session.transport = Mock()
+        ssh_session.transport.open_session.return_value = FakeExecChannel(exit_status=0)
+
+        ssh_session._exec_sync("ls", None, 1.0, 1000)
+
+        assert ssh_session.transport.open_session.call_args.kwargs["window_size"] > 2 ** 21
+
+class TestWaitReadable:
+    """Test waiting on the channel's file descriptor."""
+
+    @pytest.mark.asyncio
+    async def test_reader_registered_only_while_waiting(self, ssh_session):
+        """Test that unread data can't keep waking the loop once the wait is over."""
+        ssh_session.channel = FakeExecChannel()
+        os.write(ssh_session.channel._write_fd, b"x")
+        loop = asyncio.get_running_loop()
+
+        await asyncio.wait_for(ssh_session._wait_readable(5.0), 1.0)
+
+        # remove_reader reports whether a reader was still registered
+        assert loop.remove_reader(ssh_session.channel.fileno()) is False
+        ssh_session.channel.close()
+
+class TestExecuteCommands:
+    """Test splitting batch output into per-command results."""
+
+    @pytest.mark.asyncio
+    async def test_results_follow_sentinels(self, ssh_session):
+        """Test that each command gets its own output and exit status."""
+        ssh_session.channel = FakeChannel([
+            b"file.txt\n__EXIT_STATUS:0:0__\nbad\n__EXIT_STATUS:0:2__\ntestuser\n__EXIT_STATUS:0__\n"
+        ])
+
+        results = await ssh_session.execute_commands(["ls", "cat missing", "whoami"])
+
+        assert [result.stdout for result in results] == ["file.txt", "bad", "testuser"]
+        assert [result.exit_status for result in results] == [0, 2, 0]
+
+    @pytest.mark.asyncio
+    async def test_timeout_leaves_unfinished_commands_empty(self, ssh_session):
+        """Test that commands not reached before the timeout get no output or status."""
+        ssh_session.channel = FakeChannel([b"file.txt\n__EXIT_STATUS:0:0__\npartial\n"])
+
+        results = await ssh_session.execute_commands(["ls", "whoami"], timeout_ms=200)
+
+        assert (results[0].stdout, results[0].exit_status) == ("file.txt", 0)
+        assert (results[1].stdout, results[1].exit_status) == ("partial", None)
+
+    @pytest.mark.asyncio
+    async def test_output_limit_truncates_batch(self, ssh_session):
+        """Test that reading stops at the byte limit and the results are marked truncated."""
+        ssh_session.channel = FakeChannel([b"x" * 2000 + b"\n__EXIT_STATUS:0:0__\n"])
+
+        results = await ssh_session.execute_commands(["ls", "whoami"], timeout_ms=2000, max_bytes=1000)
+
+        assert all(result.truncated for result in results)
+        assert results[0].exit_status == 0
+        assert (results[1].stdout, results[1].exit_status) == ("", None)
+
+    @pytest.mark.asyncio
+    async def test_password_prompt_keeps_finished_commands(self, ssh_session):
+        """Test that answering a prompt mid-batch doesn't discard earlier commands' output."""
+        ssh_session.channel = FakeChannel([
+            b"file.txt\n__EXIT_STATUS:0:0__\n[sudo] password for testuser: ",
+            b"\nroot\n__EXIT_STATUS:0__\n",
+        ])
+
+        results = await ssh_session.execute_commands(["ls", "whoami"], sudo_password="secret")
+
+        assert ssh_session.channel.sent[1] == b"secret\n"
+        assert (results[0].stdout, results[0].exit_status) == ("file.txt", 0)
+        assert (results[1].stdout, results[1].exit_status) == ("root", 0)
+
+    @pytest.mark.asyncio
+    async def test_sudo_after_first_command_reported_as_sudo(self, ssh_session, monkeypatch):
+        """Test that a hanging batch gets the sudo timeout when a later command uses sudo."""
+        monkeypatch.setattr(ssh_session.security.config, "permissibility_level", PermissibilityLevel.HIGH)
+        monkeypatch.setattr(ssh_session.config.ssh, "hang_threshold_seconds", 0.2)
+        ssh_session.channel = FakeChannel([b"file.txt\n__EXIT_STATUS:0:0__\n"])
+
+        results = await ssh_session.execute_commands(["ls", "sudo whoami"], timeout_ms=2000)
+
+        assert "Sudo command timed out" in results[1].stderr
+
+class TestPasswordPrompts:
+    """Test password prompt handling in the shell."""
+
+    @pytest.mark.asyncio
+    async def test_prompt_without_colon_reported(self, ssh_session):
+        """Test that a sudo prompt not ending in ':' is recognised without a password manager."""
+        ssh_session.channel = FakeChannel([b"[sudo] password for testuser"])
+
+        result = await ssh_session.execute_command("ls", timeout_ms=2000)
+
+        assert result.exit_status == 1
+        assert "Password required" in result.stderr
+
+class TestIsolatedExecution:
+    """Test commands run on their own exec channel."""
+
+    @pytest.fixture
+    def run_isolated(self, ssh_session):
+        """Run a command on an exec channel scripted with the given output."""
+        async def run(command, exec_channel, **kwargs):
+            ssh_session.channel = FakeChannel([])
+            ssh_session.transport = Mock()
+            ssh_session.transport.open_session.return_value = exec_channel
+            return await ssh_session.execute_command(command, isolated=True, **kwargs)
+        return run
+
+    @pytest.mark.asyncio
+    async def test_output_and_exit_status(self, run_isolated):
+        """Test that stdout, stderr and the exit status come back separately."""
+        exec_channel = FakeExecChannel(b"file.txt\n", b"warning\n", exit_status=3)
+
+        result = await run_isolated("ls", exec_channel)
+
+        assert (result.stdout, result.stderr, result.exit_status) == ("file.txt\n", "warning\n", 3)
+        assert result.truncated is False
+        assert exec_channel.closed
+
+    @pytest.mark.asyncio
+    async def test_timeout_reports_in_stderr(self, run_isolated):
+        """Test that a command still running at the deadline says so in stderr."""
+        result = await run_isolated("ls", FakeExecChannel(b"partial\n"), timeout_ms=100)
+
+        assert result.stdout == "partial\n"
+        assert result.exit_status is None
+        assert "timed out" in result.stderr
+
+    @pytest.mark.asyncio
+    async def test_truncation_caps_stdout_and_stderr(self, run_isolated):
+        """Test that stdout and stderr together stay within the byte limit."""
+        exec_channel = FakeExecChannel(b"out\n" * 150, b"err\n" * 150, exit_status=0)
+
+        result = await run_isolated("ls", exec_channel, max_bytes=1000)
+
+        assert result.truncated is True
+        assert result.exit_status is None
+        assert len(result.stdout) + len(result.stderr) == 1000
+
+    @pytest.mark.asyncio
+    async def test_stderr_only_output_is_read_promptly(self, run_isolated):
+        """Test that stderr arriving later is read without waiting out the timeout."""
+        exec_channel = FakeExecChannel()
+        # stderr doesn't make the channel's fd readable
+        threading.Timer(0.05, exec_channel.stderr.extend, [b"err\n" * 500]).start()
+
+        start = time.monotonic()
+        result = await run_isolated("ls", exec_channel, timeout_ms=5000, max_bytes=1000)
+
+        assert time.monotonic() - start < 1.0
+        assert result.truncated is True
+        assert result.stderr == "err\n" * 250
+
+    @pytest.mark.asyncio
+    async def test_sudo_uses_the_shell(self, ssh_session, run_isolated, monkeypatch):
+        """Test that sudo commands skip the exec channel, since they may prompt for a password."""
+        monkeypatch.setattr(ssh_session.security.config, "permissibility_level", PermissibilityLevel.HIGH)
+
+        await run_isolated("sudo ls", FakeExecChannel(b"root\n", exit_status=0), timeout_ms=100)
+
+        assert not ssh_session.transport.open_session.called
@@ -0,0 +1,201 @@
+"""Tests for the session manager."""
+
+import pytest
+from unittest.mock import AsyncMock, Mock
+from mcp_remote_ssh.session import auth_fingerprint
+from mcp_remote_ssh.session_manager import SessionManager
+
+KEY = auth_fingerprint("key", {"key_path": "/home/user/.ssh/id_rsa"})
+
+@pytest.fixture
+def session_manager():
+    return SessionManager()
+
+def _connected(session, transport):
+    """Mark a session as connected over the given transport."""
+    session.connected = True
+    session.transport = transport
+    return session
+
+class TestTransportSharing:
+    """Test reuse of live transports between sessions."""
+
+    @pytest.mark.asyncio
+    async def test_new_session_reuses_live_transport(self, session_manager):
+        """Test that a session to the same host/user gets the existing transport."""
+        transport = Mock()
+        transport.is_active.return_value = True
+        first = await session_manager.create_session("s1", "host", 22, "user", auth_fingerprint=KEY)
+        _connected(first, transport)
+
+        second = await session_manager.create_session("s2", "host", 22, "user", auth_fingerprint=KEY)
+        other_user = await session_manager.create_session("s3", "host", 22, "other", auth_fingerprint=KEY)
+
+        assert second._shared_transport is transport
+        assert other_user._shared_transport is None
+
+    @pytest.mark.asyncio
+    async def test_full_transport_not_reused(self, session_manager):
+        """Test that a transport at the per-connection session limit is not handed out."""
+        transport = Mock()
+        transport.is_active.return_value = True
+        _connected(await session_manager.create_session("s1", "host", 22, "user", auth_fingerprint=KEY), transport)
+        second = await session_manager.create_session("s2", "host", 22, "user", auth_fingerprint=KEY)
+        third = await session_manager.create_session("s3", "host", 22, "user", auth_fingerprint=KEY)
+        fourth = await session_manager.create_session("s4", "host", 22, "user", auth_fingerprint=KEY)
+
+        assert second._shared_transport is transport
+        assert third._shared_transport is transport
+        assert fourth._shared_transport is None
+
+    @pytest.mark.asyncio
+    async def test_dead_transport_not_reused(self, session_manager):
+        """Test that inactive transports are not handed out."""
+        transport = Mock()
+        transport.is_active.return_value = False
+        first = await session_manager.create_session("s1", "host", 22, "user", auth_fingerprint=KEY)
+        _connected(first, transport)
+
+        second = await session_manager.create_session("s2", "host", 22, "user", auth_fingerprint=KEY)
+
+        assert second._shared_transport is None
+
+    @pytest.mark.asyncio
+    async def test_transport_not_shared_across_credentials(self, session_manager):
+        """Test that only sessions with the same credentials share a transport."""
+        transport = Mock()
+        transport.is_active.return_value = True
+        _connected(await session_manager.create_session("s1", "host", 22, "user", auth_fingerprint=KEY), transport)
+
+        other_key = await session_manager.create_session(
+            "s2", "host", 22, "user", auth_fingerprint=auth_fingerprint("password", {"password": "guess"}))
+        unknown = await session_manager.create_session("s3", "host", 22, "user")
+
+        assert other_key._shared_transport is None
+        assert unknown._shared_transport is None
+
+    @pytest.mark.asyncio
+    async def test_connect_with_other_credentials_authenticates(self, session_manager):
+        """Test that a session handed a transport authenticates itself if its credentials differ."""
+        shared, own = Mock(), Mock()
+        shared.is_active.return_value = True
+        _connected(await session_manager.create_session("s1", "host", 22, "user", auth_fingerprint=KEY), shared)
+        session = await session_manager.create_session("s2", "host", 22, "user", auth_fingerprint=KEY)
+        session._open_transport = AsyncMock(return_value=own)
+        session._open_shell_sync = Mock()
+        session._setup_environment = AsyncMock()
+
+        assert await session.connect("password", password="wrong") is True
+
+        session._open_transport.assert_awaited_once()
+        assert session.transport is own
+
+    @pytest.mark.asyncio
+    async def test_remove_session_keeps_shared_transport_open(self, session_manager):
+        """Test that removing one of two sessions on a transport leaves it open."""
+        transport = Mock()
+        transport.is_active.return_value = True
+        first = _connected(await session_manager.create_session("s1", "host", 22, "user", auth_fingerprint=KEY), transport)
+        second = _connected(await session_manager.create_session("s2", "host", 22, "user", auth_fingerprint=KEY), transport)
+        first.client = Mock()
+
+        await session_manager.remove_session("s1")
+
+        assert not transport.close.called
+        assert first.transport is None
+
+        await session_manager.remove_session("s2")
+
+        assert transport.close.called
+
+    @pytest.mark.asyncio
+    async def test_disconnect_dead_sessions(self, session_manager):
+        """Test that sessions on a dropped transport are disconnected."""
+        live, dead = Mock(), Mock()
+        live.is_active.return_value = True
+        dead.is_active.return_value = False
+        _connected(await session_manager.create_session("s1", "host", 22, "user", auth_fingerprint=KEY), live)
+        lost = _connected(await session_manager.create_session("s2", "other", 22, "user", auth_fingerprint=KEY), dead)
+
+        assert await session_manager.disconnect_dead_sessions() == 1
+        assert not lost.connected
+        assert session_manager.get_session("s1").connected
+
+class TestSessionEviction:
+    """Test session eviction and expiry."""
+
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used(self, session_manager, monkeypatch):
+        """Test that the least recently used session is removed at capacity."""
+        monkeypatch.setattr(session_manager.config.security, "max_sessions", 2)
+        await session_manager.create_session("s1", "host", 22, "user")
+        await session_manager.create_session("s2", "host", 22, "user")
+
+        # Using s1 makes s2 the least recently used
+        session_manager.get_session("s1")
+        await session_manager.create_session("s3", "host", 22, "user")
+
+        assert list(session_manager.sessions) == ["s1", "s3"]
+
+    @pytest.mark.asyncio
+    async def test_cleanup_removes_only_expired(self, session_manager, monkeypatch):
+        """Test that expiry removes sessions older than the session timeout."""
+        monkeypatch.setattr(session_manager.config.security, "session_timeout_hours", 1)
+        await session_manager.create_session("old", "host", 22, "user")
+        await session_manager.create_session("new", "host", 22, "user")
+        session_manager.session_creation_times["old"] -= 2 * 3600
+
+        assert await session_manager.cleanup_expired_sessions() == 1
+        assert list(session_manager.sessions) == ["new"]
+
+    @pytest.mark.asyncio
+    async def test_cleanup_delay_follows_oldest_session(self, session_manager, monkeypatch):
+        """Test that the cleanup loop wakes when the oldest session expires."""
+        monkeypatch.setattr(session_manager.config.security, "session_timeout_hours", 1)
+        assert session_manager._next_cleanup_delay() == 300
+
+        await session_manager.create_session("s1", "host", 22, "user")
+        session_manager.session_creation_times["s1"] -= 3600 - 60
+        assert 50 < session_manager._next_cleanup_delay() <= 60
+
+        session_manager.session_creation_times["s1"] -= 120
+        assert session_manager._next_cleanup_delay() == 1
+        session_manager.stop_cleanup_task()
+
+class TestPrivateKeyCache:
+    """Test caching of parsed private keys."""
+
+    @pytest.fixture
+    def parse(self, monkeypatch):
+        parse = Mock(side_effect=lambda key_data: object())
+        monkeypatch.setattr("mcp_remote_ssh.session_manager.parse_private_key", parse)
+        return parse
+
+    def test_same_key_parsed_once(self, session_manager, parse):
+        """Test that identical key material is parsed only once."""
+        first = session_manager._load_private_key("digest", b"pem")
+
+        assert session_manager._load_private_key("digest", b"pem") is first
+        assert parse.call_count == 1
+
+    def test_cache_is_bounded(self, session_manager, parse):
+        """Test that the least recently used key is dropped when the cache is full."""
+        for index in range(9):
+            session_manager._load_private_key(f"digest{index}", b"pem")
+
+        assert len(session_manager._pkey_cache) == 8
+        assert "digest0" not in session_manager._pkey_cache
+
+    @pytest.mark.asyncio
+    async def test_key_dropped_with_last_session(self, session_manager, parse):
+        """Test that a key is evicted once no session uses it."""
+        for session_id in ("s1", "s2"):
+            session = await session_manager.create_session(session_id, "host", 22, "user")
+            session.key_digest = "digest"
+        session_manager._load_private_key("digest", b"pem")
+
+        await session_manager.remove_session("s1")
+        assert "digest" in session_manager._pkey_cache
+
+        await session_manager.remove_session("s2")
+        assert "digest" not in session_manager._pkey_cache
@@ -6,11 +6,12 @@ from unittest.mock import Mock, AsyncMock, patch
 from typing import Dict, Any
 
 from ..tool_handlers import (
-    ToolHandler, SSHConnectHandler, SSHRunHandler, SSHDisconnectHandler,
-    SSHListSessionsHandler, ToolHandlerFactory, ToolContext
+    ToolHandler, SSHConnectHandler, SSHRunHandler, SSHRunBatchHandler, SSHDisconnectHandler,
+    SSHUploadHandler, SSHDownloadHandler, SSHListSessionsHandler, ToolHandlerFactory, ToolContext
 )
 from ..session import SessionInfo
 from datetime import datetime
+import base64
 
 class TestToolHandler:
     """Test the abstract ToolHandler base class."""
@@ -188,6 +189,55 @@ class TestSSHRunHandler:
         assert result["success"] is False
         assert "not connected" in result["error"]
 
+    @pytest.mark.asyncio
+    async def test_execute_isolated_command(self):
+        """Test that isolated execution is passed through to the session."""
+        context = Mock()
+        mock_session = AsyncMock()
+        mock_session.connected = True
+        mock_session.execute_command.return_value = Mock(
+            stdout="ok", stderr="", exit_status=0, duration_ms=5, truncated=False
+        )
+        context.session_manager.get_session.return_value = mock_session
+
+        result = await SSHRunHandler(context).execute(
+            session_id="test_session",
+            cmd="uname -a",
+            isolated=True
+        )
+
+        assert result["success"] is True
+        assert mock_session.execute_command.call_args.kwargs["isolated"] is True
+
+class TestSSHRunBatchHandler:
+    """Test batched SSH command execution handler."""
+    
+    def test_validate_parameters_without_cmds(self):
+        """Test parameter validation with an empty command list."""
+        error = SSHRunBatchHandler(Mock()).validate_parameters(session_id="test_session", cmds=[])
+        assert "cmds" in error
+    
+    @pytest.mark.asyncio
+    async def test_execute_returns_result_per_command(self):
+        """Test that each command's result is returned in order."""
+        context = Mock()
+        mock_session = AsyncMock()
+        mock_session.connected = True
+        mock_session.execute_commands.return_value = [
+            Mock(stdout="up", stderr="", exit_status=0, duration_ms=5, truncated=False),
+            Mock(stdout="", stderr="", exit_status=1, duration_ms=5, truncated=False),
+        ]
+        context.session_manager.get_session.return_value = mock_session
+
+        result = await SSHRunBatchHandler(context).execute(
+            session_id="test_session",
+            cmds=["uptime", "ls /missing"]
+        )
+
+        assert result["success"] is True
+        assert [r["exit_status"] for r in result["results"]] == [0, 1]
+        assert mock_session.execute_commands.call_args.args[0] == ["uptime", "ls /missing"]
+
 class TestSSHDisconnectHandler:
     """Test SSH disconnection handler."""
     
@@ -223,6 +273,100 @@ class TestSSHDisconnectHandler:
         assert result["session_id"] == "test_session"
         assert "disconnected" in result["message"]
 
+class TestSSHUploadHandler:
+    """Test SSH upload handler."""
+    
+    @pytest.fixture
+    def mock_context(self):
+        """Create a mock tool context."""
+        return Mock()
+    
+    @pytest.fixture
+    def handler(self, mock_context):
+        """Create an SSH upload handler."""
+        return SSHUploadHandler(mock_context)
+    
+    def test_validate_parameters_without_content(self, handler):
+        """Test parameter validation without content."""
+        error = handler.validate_parameters(session_id="test_session", path="/tmp/file")
+        assert "bytes_base64 is required" in error
+    
+    @pytest.mark.asyncio
+    async def test_execute_successful_upload(self, handler, mock_context):
+        """Test content is decoded before being handed to the session."""
+        mock_session = AsyncMock()
+        mock_session.connected = True
+        mock_session.upload_file.return_value = True
+        mock_context.session_manager.get_session.return_value = mock_session
+        
+        result = await handler.execute(
+            session_id="test_session",
+            path="/tmp/file.txt",
+            bytes_base64=base64.b64encode(b"payload").decode()
+        )
+        
+        assert result["success"] is True
+        assert result["size"] == 7
+        mock_session.upload_file.assert_awaited_once_with("/tmp/file.txt", b"payload", mode="644")
+    
+    @pytest.mark.asyncio
+    async def test_execute_invalid_base64(self, handler, mock_context):
+        """Test malformed base64 is rejected."""
+        result = await handler.execute(
+            session_id="test_session",
+            path="/tmp/file.txt",
+            bytes_base64="not base64!"
+        )
+        
+        assert result["success"] is False
+        assert "Invalid base64" in result["error"]
+
+class TestSSHDownloadHandler:
+    """Test SSH download handler."""
+    
+    @pytest.fixture
+    def mock_context(self):
+        """Create a mock tool context."""
+        return Mock()
+    
+    @pytest.fixture
+    def handler(self, mock_context):
+        """Create an SSH download handler."""
+        return SSHDownloadHandler(mock_context)
+    
+    def test_validate_parameters_without_path(self, handler):
+        """Test parameter validation without path."""
+        error = handler.validate_parameters(session_id="test_session")
+        assert "path is required" in error
+    
+    @pytest.mark.asyncio
+    async def test_execute_successful_download(self, handler, mock_context):
+        """Test downloaded content is returned base64-encoded."""
+        mock_session = AsyncMock()
+        mock_session.connected = True
+        mock_session.download_file.return_value = b"hello\x00world"
+        mock_context.session_manager.get_session.return_value = mock_session
+        
+        result = await handler.execute(session_id="test_session", path="/tmp/file.bin")
+        
+        assert result["success"] is True
+        assert result["size"] == 11
+        assert isinstance(result["bytes_base64"], str)
+        assert base64.b64decode(result["bytes_base64"]) == b"hello\x00world"
+    
+    @pytest.mark.asyncio
+    async def test_execute_download_failure(self, handler, mock_context):
+        """Test a failed download is reported as an error."""
+        mock_session = AsyncMock()
+        mock_session.connected = True
+        mock_session.download_file.return_value = None
+        mock_context.session_manager.get_session.return_value = mock_session
+        
+        result = await handler.execute(session_id="test_session", path="/tmp/missing")
+        
+        assert result["success"] is False
+        assert "Failed to download" in result["error"]
+
 class TestSSHListSessionsHandler:
     """Test SSH session listing handler."""
     
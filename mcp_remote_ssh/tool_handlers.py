@@ -1,18 +1,27 @@
 """Tool handlers for MCP SSH operations following SOLID principles."""
 
+import base64
 import logging
 import uuid
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Type
 from dataclasses import dataclass
 import os
 
 from .config import get_config
 from .session_manager import get_session_manager
-from .session import SessionInfo
+from .session import SessionInfo, auth_fingerprint
 from .security import get_security_manager
 from .interactive_password_service import get_password_service, PasswordRequest
 
+try:
+    # Optional C extension that encodes straight to str, skipping the bytes -> str copy
+    from pybase64 import b64encode_as_string as _b64encode_str
+except ImportError:
+    def _b64encode_str(data: bytes) -> str:
+        """Base64-encode bytes to an ASCII str."""
+        return base64.b64encode(data).decode()
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -54,18 +63,19 @@ class SSHConnectHandler(ToolHandler):
             port = kwargs.get('port') or self.context.config.ssh.default_port
             username = kwargs.get('username') or self.context.config.ssh.default_username
             session_id = kwargs.get('session_id') or str(uuid.uuid4())[:8]
-            auth = kwargs.get('auth')
+            auth_method, auth_kwargs = self._auth_parameters(kwargs.get('auth'))
             
             # Create session
             session = await self.context.session_manager.create_session(
                 session_id=session_id,
                 host=host,
                 port=port,
-                username=username
+                username=username,
+                auth_fingerprint=auth_fingerprint(auth_method, auth_kwargs)
             )
             
             # Handle authentication
-            auth_result = await self._handle_authentication(session, auth)
+            auth_result = await self._handle_authentication(session, auth_method, auth_kwargs)
             if not auth_result["success"]:
                 return auth_result
             
@@ -93,8 +103,8 @@ class SSHConnectHandler(ToolHandler):
         
         return None
     
-    async def _handle_authentication(self, session, auth: Optional[Dict[str, Any]]) -> Dict[str, Any]:
-        """Handle authentication for the session."""
+    def _auth_parameters(self, auth: Optional[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+        """Pick the authentication method and its arguments from the tool's auth parameter."""
         auth_method = "key"
         auth_kwargs = {}
         
@@ -111,6 +121,10 @@ class SSHConnectHandler(ToolHandler):
             if self.context.config.ssh.key_path:
                 auth_kwargs["key_path"] = self.context.config.ssh.key_path
         
+        return auth_method, auth_kwargs
+    
+    async def _handle_authentication(self, session, auth_method: str, auth_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle authentication for the session."""
         success = await session.connect(auth_method, **auth_kwargs)
         
         if success:
@@ -136,6 +150,7 @@ class SSHRunHandler(ToolHandler):
             timeout_ms = kwargs.get('timeout_ms')
             max_bytes = kwargs.get('max_bytes')
             sudo_password = kwargs.get('sudo_password')
+            isolated = kwargs.get('isolated', False)
             
             # Get session
             session = self.context.session_manager.get_session(session_id)
@@ -162,7 +177,8 @@ class SSHRunHandler(ToolHandler):
                 input_data=input_data,
                 timeout_ms=timeout_ms,
                 max_bytes=max_bytes,
-                sudo_password=sudo_password
+                sudo_password=sudo_password,
+                isolated=isolated
             )
             
             return {
@@ -187,6 +203,62 @@ class SSHRunHandler(ToolHandler):
             return "cmd is required"
         return None
 
+class SSHRunBatchHandler(ToolHandler):
+    """Handles execution of several commands in one shell round-trip."""
+    
+    async def execute(self, **kwargs) -> Dict[str, Any]:
+        """Execute a list of commands in an existing SSH session."""
+        try:
+            # Validate parameters
+            error = self.validate_parameters(**kwargs)
+            if error:
+                return {"success": False, "error": error}
+            
+            session_id = kwargs['session_id']
+            
+            # Get session
+            session = self.context.session_manager.get_session(session_id)
+            if not session:
+                return {"success": False, "error": f"Session '{session_id}' not found"}
+            
+            if not session.connected:
+                return {"success": False, "error": f"Session '{session_id}' not connected"}
+            
+            # The session falls back to the configured sudo password itself
+            results = await session.execute_commands(
+                kwargs['cmds'],
+                timeout_ms=kwargs.get('timeout_ms'),
+                max_bytes=kwargs.get('max_bytes'),
+                sudo_password=kwargs.get('sudo_password')
+            )
+            
+            return {
+                "success": True,
+                "session_id": session_id,
+                "results": [
+                    {
+                        "stdout": result.stdout,
+                        "stderr": result.stderr,
+                        "exit_status": result.exit_status,
+                        "duration_ms": result.duration_ms,
+                        "truncated": result.truncated
+                    }
+                    for result in results
+                ]
+            }
+            
+        except Exception as e:
+            logger.error(f"SSH run batch error: {e}")
+            return {"success": False, "error": str(e)}
+    
+    def validate_parameters(self, **kwargs) -> Optional[str]:
+        """Validate SSH run batch parameters."""
+        if 'session_id' not in kwargs:
+            return "session_id is required"
+        if not kwargs.get('cmds'):
+            return "cmds must be a non-empty list of commands"
+        return None
+
 class SSHDisconnectHandler(ToolHandler):
     """Handles SSH session disconnection."""
     
@@ -217,6 +289,104 @@ class SSHDisconnectHandler(ToolHandler):
             return "session_id is required"
         return None
 
+class SSHUploadHandler(ToolHandler):
+    """Handles uploading files to the remote system."""
+    
+    async def execute(self, **kwargs) -> Dict[str, Any]:
+        """Upload base64-encoded content to a remote file."""
+        try:
+            # Validate parameters
+            error = self.validate_parameters(**kwargs)
+            if error:
+                return {"success": False, "error": error}
+            
+            session_id = kwargs['session_id']
+            path = kwargs['path']
+            mode = kwargs.get('mode') or "644"
+            
+            try:
+                content = base64.b64decode(kwargs['bytes_base64'], validate=True)
+            except ValueError as e:
+                return {"success": False, "error": f"Invalid base64 content: {e}"}
+            
+            session = self.context.session_manager.get_session(session_id)
+            if not session:
+                return {"success": False, "error": f"Session '{session_id}' not found"}
+            
+            if not session.connected:
+                return {"success": False, "error": f"Session '{session_id}' not connected"}
+            
+            if not await session.upload_file(path, content, mode=mode):
+                return {"success": False, "error": f"Failed to upload '{path}'"}
+            
+            return {
+                "success": True,
+                "session_id": session_id,
+                "path": path,
+                "size": len(content),
+                "message": f"Uploaded {len(content)} bytes to {path}"
+            }
+            
+        except Exception as e:
+            logger.error(f"SSH upload error: {e}")
+            return {"success": False, "error": str(e)}
+    
+    def validate_parameters(self, **kwargs) -> Optional[str]:
+        """Validate SSH upload parameters."""
+        if 'session_id' not in kwargs:
+            return "session_id is required"
+        if 'path' not in kwargs:
+            return "path is required"
+        if 'bytes_base64' not in kwargs:
+            return "bytes_base64 is required"
+        return None
+
+class SSHDownloadHandler(ToolHandler):
+    """Handles downloading files from the remote system."""
+    
+    async def execute(self, **kwargs) -> Dict[str, Any]:
+        """Download a remote file and return it base64-encoded."""
+        try:
+            # Validate parameters
+            error = self.validate_parameters(**kwargs)
+            if error:
+                return {"success": False, "error": error}
+            
+            session_id = kwargs['session_id']
+            path = kwargs['path']
+            max_bytes = kwargs.get('max_bytes')
+            
+            session = self.context.session_manager.get_session(session_id)
+            if not session:
+                return {"success": False, "error": f"Session '{session_id}' not found"}
+            
+            if not session.connected:
+                return {"success": False, "error": f"Session '{session_id}' not connected"}
+            
+            content = await session.download_file(path, max_bytes=max_bytes)
+            if content is None:
+                return {"success": False, "error": f"Failed to download '{path}'"}
+            
+            return {
+                "success": True,
+                "session_id": session_id,
+                "path": path,
+                "size": len(content),
+                "bytes_base64": _b64encode_str(content)
+            }
+            
+        except Exception as e:
+            logger.error(f"SSH download error: {e}")
+            return {"success": False, "error": str(e)}
+    
+    def validate_parameters(self, **kwargs) -> Optional[str]:
+        """Validate SSH download parameters."""
+        if 'session_id' not in kwargs:
+            return "session_id is required"
+        if 'path' not in kwargs:
+            return "path is required"
+        return None
+
 class SSHListSessionsHandler(ToolHandler):
     """Handles listing SSH sessions."""
     
@@ -400,6 +570,21 @@ class SSHGetPermissibilityInfoHandler(ToolHandler):
 class ToolHandlerFactory:
     """Factory for creating tool handlers following Factory Pattern."""
     
+    # Tool name -> handler class, built once instead of on every tool call
+    _HANDLERS: Dict[str, Type[ToolHandler]] = {
+        'ssh_connect': SSHConnectHandler,
+        'ssh_run': SSHRunHandler,
+        'ssh_run_batch': SSHRunBatchHandler,
+        'ssh_disconnect': SSHDisconnectHandler,
+        'ssh_upload': SSHUploadHandler,
+        'ssh_download': SSHDownloadHandler,
+        'ssh_list_sessions': SSHListSessionsHandler,
+        'ssh_list_password_requests': SSHListPasswordRequestsHandler,
+        'ssh_provide_password': SSHProvidePasswordHandler,
+        'ssh_cancel_password_request': SSHCancelPasswordRequestHandler,
+        'ssh_get_permissibility_info': SSHGetPermissibilityInfoHandler,
+    }
+    
     def __init__(self):
         self.context = ToolContext(
             config=get_config(),
@@ -409,18 +594,7 @@ class ToolHandlerFactory:
     
     def create_handler(self, tool_name: str) -> ToolHandler:
         """Create a tool handler for the specified tool."""
-        handlers = {
-            'ssh_connect': SSHConnectHandler,
-            'ssh_run': SSHRunHandler,
-            'ssh_disconnect': SSHDisconnectHandler,
-            'ssh_list_sessions': SSHListSessionsHandler,
-            'ssh_list_password_requests': SSHListPasswordRequestsHandler,
-            'ssh_provide_password': SSHProvidePasswordHandler,
-            'ssh_cancel_password_request': SSHCancelPasswordRequestHandler,
-            'ssh_get_permissibility_info': SSHGetPermissibilityInfoHandler,
-        }
-        
-        handler_class = handlers.get(tool_name)
+        handler_class = self._HANDLERS.get(tool_name)
         if not handler_class:
             raise ValueError(f"Unknown tool: {tool_name}")
         